@@ -0,0 +1,106 @@
+"""Outbox for data node writes that follow an auth database change
+
+Routes add a PendingDataNodeOp in the same transaction as the auth rows it
+belongs to, so the two commit or roll back together. A background loop then
+pushes pending ops to the data node in insertion order, deleting each one
+once the data node accepts it and retrying failures with exponential backoff.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict
+import asyncio
+
+import httpx
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.orm import Session
+
+from backend.common import PendingDataNodeOp
+
+# Check for due ops at least this often, even without a wake-up
+OUTBOX_POLL_SECONDS = 30.0
+# Retry delay doubles per failed attempt, from the base up to the cap
+OUTBOX_RETRY_BASE_SECONDS = 1.0
+OUTBOX_RETRY_MAX_SECONDS = 300.0
+# Ops sent per delivery pass
+OUTBOX_BATCH_SIZE = 100
+
+_DUE_OPS = (
+    select(PendingDataNodeOp)
+    .where(PendingDataNodeOp.status == "pending", PendingDataNodeOp.next_attempt_at <= bindparam("now"))
+    .order_by(PendingDataNodeOp.id)
+    .limit(OUTBOX_BATCH_SIZE)
+)
+_NEXT_ATTEMPT = select(func.min(PendingDataNodeOp.next_attempt_at)).where(PendingDataNodeOp.status == "pending")
+
+
+class DataNodeOutbox:
+    """Deliver queued PendingDataNodeOp rows to the data node"""
+
+    def __init__(self, session_factory: Callable[[], Session], client: httpx.AsyncClient):
+        self.session_factory = session_factory
+        self.client = client
+        self._wakeup = asyncio.Event()
+
+    @staticmethod
+    def add(db: Session, path: str, payload: Dict[str, Any]) -> PendingDataNodeOp:
+        """Queue a POST of payload to path, committed with the caller's transaction"""
+        op = PendingDataNodeOp(path=path, payload=payload, next_attempt_at=datetime.now(timezone.utc))
+        db.add(op)
+        return op
+
+    def wake(self):
+        """Deliver newly committed ops now instead of at the next poll"""
+        self._wakeup.set()
+
+    async def run(self):
+        """Delivery loop; runs until cancelled"""
+        delay = 0.0  # Deliver anything left over from a previous run straight away
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                delay = await self.deliver_due()
+            except Exception:
+                # e.g. the database is unavailable; undelivered ops stay
+                # queued, so try again at the next poll
+                delay = OUTBOX_POLL_SECONDS
+
+    async def deliver_due(self) -> float:
+        """Send every op that is due, in order. Returns seconds until the next one is due."""
+        with self.session_factory() as db:
+            due = db.execute(_DUE_OPS, {"now": datetime.now(timezone.utc)}).scalars().all()
+            for op in due:
+                try:
+                    response = await self.client.post(op.path, json=op.payload)
+                except httpx.HTTPError as e:
+                    self._retry_later(op, str(e))
+                else:
+                    if response.is_success:
+                        db.delete(op)
+                    elif response.is_client_error:
+                        # Sending the same request again will not change the answer
+                        op.status = "failed"
+                        op.attempts += 1
+                        op.last_error = response.text[:500]
+                    else:
+                        self._retry_later(op, response.text)
+                db.commit()
+
+            next_attempt_at = db.execute(_NEXT_ATTEMPT).scalar()
+
+        if next_attempt_at is None:
+            return OUTBOX_POLL_SECONDS
+        if next_attempt_at.tzinfo is None:
+            next_attempt_at = next_attempt_at.replace(tzinfo=timezone.utc)
+        wait = (next_attempt_at - datetime.now(timezone.utc)).total_seconds()
+        return min(max(wait, 0.0), OUTBOX_POLL_SECONDS)
+
+    @staticmethod
+    def _retry_later(op: PendingDataNodeOp, error: str):
+        delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** min(op.attempts, 16), OUTBOX_RETRY_MAX_SECONDS)
+        op.attempts += 1
+        op.last_error = error[:500]
+        op.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+
@@ -1,9 +1,11 @@
 """Authentication Node - User authentication and token management service"""
-from fastapi import FastAPI, HTTPException, Depends, Header, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List
+import asyncio
 import os
 import httpx
 from pathlib import Path
@@ -29,10 +31,12 @@ from backend.common import (
     generate_registration_code, generate_reset_code, hash_token,
     get_current_user_from_token,
     create_socket_server_config, SocketClient,
+    ORJSONResponse, JWTMiddleware,
+    SERVICE_LIMITS, close_service_client,
 )
 from backend.common.auth_helpers import (
     get_user_by_username, get_user_by_id, get_user_id, get_user_type,
-    has_2fa, get_totp_secret, set_totp_secret, is_active
+    has_2fa, get_totp_secret, set_totp_secret, is_active, get_admin,
 )
 
 # Import router factories
@@ -42,12 +46,14 @@ from backend.auth_node.routers.user_account_routes import create_user_account_ro
 from backend.auth_node.routers.admin_basic_routes import create_admin_basic_router
 from backend.auth_node.routers.auth_routes import create_auth_router
 from backend.auth_node.routers.user_management_routes import create_user_management_router
+from backend.auth_node.data_node_outbox import DataNodeOutbox
 
 # Configuration
 DATABASE_URL = get_database_url("auth_data.db")
 DATA_NODE_URL = os.getenv("DATA_NODE_URL", "http://localhost:8001")
 INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
 PORT = int(os.getenv("PORT", "8002"))
+DATA_NODE_TIMEOUT = httpx.Timeout(10.0)
 
 # Database setup
 engine = create_db_engine(DATABASE_URL)
@@ -93,8 +99,41 @@ def ensure_initial_admin():
 # Ensure default admin exists at startup (works for uvicorn or python -m)
 ensure_initial_admin()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one pooled HTTP client to the data node for the app's lifetime,
+    and deliver queued data node writes in the background"""
+    app.state.http_client = httpx.AsyncClient(
+        base_url=DATA_NODE_URL,
+        headers={"Internal-Token": INTERNAL_TOKEN},
+        limits=SERVICE_LIMITS,
+        timeout=DATA_NODE_TIMEOUT,
+    )
+    app.state.data_node_outbox = DataNodeOutbox(SessionLocal, app.state.http_client)
+    outbox_task = asyncio.create_task(app.state.data_node_outbox.run())
+    try:
+        yield
+    finally:
+        outbox_task.cancel()
+        try:
+            await outbox_task
+        except asyncio.CancelledError:
+            pass
+        await app.state.http_client.aclose()
+        await close_service_client()
+
+
 # FastAPI app
-app = FastAPI(title="Authentication Node", version="1.0.0")
+app = FastAPI(
+    title="Authentication Node",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Decode the access token once for the /user/ account routes. Added before
+# CORS so CORS stays outermost and its headers are on 401 responses too.
+app.add_middleware(JWTMiddleware, prefixes=("/user/",))
 
 # CORS middleware
 app.add_middleware(
@@ -115,6 +154,16 @@ def get_db():
         db.close()
 
 
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """Shared data node HTTP client created in lifespan"""
+    return request.app.state.http_client
+
+
+def get_data_node_outbox(request: Request) -> DataNodeOutbox:
+    """Data node write outbox created in lifespan"""
+    return request.app.state.data_node_outbox
+
+
 async def verify_internal_token_header(
     internal_token: str = Header(..., alias="Internal-Token")
 ):
@@ -138,7 +187,8 @@ async def get_current_admin(
         if payload.get("user_type") != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        admin = db.query(Admin).filter(Admin.admin_id == payload.get("user_id")).first()
+        # Off the event loop so other requests progress during the query
+        admin = await asyncio.to_thread(get_admin, db, payload.get("user_id"))
         if not admin:
             raise HTTPException(status_code=404, detail="Admin not found")
         
@@ -171,7 +221,8 @@ async def verify_admin_or_internal(
         if payload.get("user_type") != "admin":
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        admin = db.query(Admin).filter(Admin.admin_id == payload.get("user_id")).first()
+        # Off the event loop so other requests progress during the query
+        admin = await asyncio.to_thread(get_admin, db, payload.get("user_id"))
         if not admin:
             raise HTTPException(status_code=404, detail="Admin not found")
         
@@ -185,10 +236,12 @@ async def verify_admin_or_internal(
 # Create and include routers
 admin_course_router = create_admin_course_router(get_db, get_current_admin)
 settings_router = create_settings_router(get_db, get_current_admin)
-user_account_router = create_user_account_router(get_db)
+user_account_router = create_user_account_router(get_db, SessionLocal)
 admin_basic_router = create_admin_basic_router(get_db, get_current_admin)
-auth_router = create_auth_router(get_db)
-user_management_router = create_user_management_router(get_db, verify_admin_or_internal, get_current_admin)
+auth_router = create_auth_router(get_db, get_data_node_outbox)
+user_management_router = create_user_management_router(
+    get_db, verify_admin_or_internal, get_current_admin, get_http_client, get_data_node_outbox
+)
 
 app.include_router(admin_course_router)
 app.include_router(settings_router)
@@ -1,21 +1,23 @@
 """Admin basic routes for Auth Node - login, admin management, codes"""
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import Callable
 from datetime import datetime, timedelta, timezone
+import asyncio
 
 from backend.common import (
-    Admin, RefreshToken, RegistrationCode, ResetCode,
+    Admin, Student, RefreshToken, RegistrationCode, ResetCode,
     AdminCreate, AdminLogin,
     RegistrationCodeCreate,
     ResetCodeCreate, ResetCodeResponse,
-    verify_password, get_password_hash,
+    verify_password_async, get_password_hash,
     create_access_token, create_refresh_token, hash_token,
     generate_totp_secret, verify_totp, get_totp_uri,
     generate_registration_code, generate_reset_code,
 )
 from backend.common.auth_helpers import (
-    get_user_by_username, get_user_by_id, get_user_id, set_totp_secret,
+    get_user_by_username, get_user_by_id, get_user_id, set_totp_secret, create_admin,
 )
 
 
@@ -38,9 +40,10 @@ def create_admin_basic_router(get_db: Callable, get_current_admin: Callable) ->
         db: Session = Depends(get_db)
     ):
         """Admin login (no 2FA required)"""
-        admin = db.query(Admin).filter(Admin.username == login_data.username).first()
+        # Lookup and password check both run off the event loop
+        admin = await asyncio.to_thread(get_user_by_username, db, login_data.username, "admin")
         
-        if not admin or not verify_password(login_data.password, admin.password_hash):
+        if not admin or not await verify_password_async(login_data.password, admin.password_hash):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Generate access token
@@ -81,17 +84,10 @@ def create_admin_basic_router(get_db: Callable, get_current_admin: Callable) ->
         db: Session = Depends(get_db)
     ):
         """Create a new admin (admin only)"""
-        # Check if admin exists
-        existing = db.query(Admin).filter(Admin.username == admin_data.username).first()
-        if existing:
+        # Insert unless the username is taken, atomically in one statement
+        admin_id = create_admin(db, admin_data.username, get_password_hash(admin_data.password))
+        if admin_id is None:
             raise HTTPException(status_code=400, detail="Admin already exists")
-        
-        # Create admin
-        db_admin = Admin(
-            username=admin_data.username,
-            password_hash=get_password_hash(admin_data.password)
-        )
-        db.add(db_admin)
         db.commit()
         
         return {"success": True, "message": "Admin created successfully"}
@@ -104,29 +100,32 @@ def create_admin_basic_router(get_db: Callable, get_current_admin: Callable) ->
     ):
         """Generate registration code(s) (admin only) - supports bulk generation"""
         expires_at = datetime.now(timezone.utc) + timedelta(days=code_data.expires_days)
+        code_tags = code_data.code_tags or []
         
-        generated_codes = []
-        for _ in range(code_data.count):
-            code = generate_registration_code()
-            
-            db_code = RegistrationCode(
-                code=code,
-                user_type=code_data.user_type,
-                created_by=current_admin.admin_id,
-                expires_at=expires_at,
-                code_tags=code_data.code_tags or []
-            )
-            db.add(db_code)
-            
-            generated_codes.append({
+        codes = [generate_registration_code() for _ in range(code_data.count)]
+        # One executemany INSERT for the whole batch instead of an ORM object per code
+        db.execute(insert(RegistrationCode), [
+            {
                 "code": code,
                 "user_type": code_data.user_type,
+                "created_by": current_admin.admin_id,
                 "expires_at": expires_at,
-                "code_tags": code_data.code_tags
-            })
-        
+                "code_tags": code_tags,
+            }
+            for code in codes
+        ])
         db.commit()
         
+        generated_codes = [
+            {
+                "code": code,
+                "user_type": code_data.user_type,
+                "expires_at": expires_at,
+                "code_tags": code_data.code_tags
+            }
+            for code in codes
+        ]
+        
         # Return single code format for backward compatibility if count=1
         if code_data.count == 1:
             return generated_codes[0]
@@ -180,11 +179,17 @@ def create_admin_basic_router(get_db: Callable, get_current_admin: Callable) ->
         # Get paginated codes
         db_codes = db.query(ResetCode).order_by(ResetCode.created_at.desc()).offset((page-1)*page_size).limit(page_size).all()
         
+        # Usernames for the whole page in one query (reset codes are for students)
+        user_ids = {code.user_id for code in db_codes}
+        usernames = dict(
+            db.query(Student.student_id, Student.username)
+            .filter(Student.student_id.in_(user_ids))
+            .all()
+        ) if user_ids else {}
+        
         codes_data = []
         for code in db_codes:
-            # Get the username for this code
-            user = get_user_by_id(db, code.user_id, "student")
-            username = user.username if user else "Unknown"
+            username = usernames.get(code.user_id, "Unknown")
             
             codes_data.append({
                 "id": code.id,
@@ -1,5 +1,5 @@
 """Admin course management routes for Auth Node"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List, Callable
 import os
@@ -49,7 +49,7 @@ def create_admin_course_router(get_db: Callable, get_current_admin: Callable) ->
                 if response.status_code != 200:
                     raise HTTPException(status_code=500, detail=f"Failed to fetch courses: {response.text}")
                 
-                return response.json()
+                return Response(content=response.content, media_type="application/json")
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
 
@@ -77,7 +77,7 @@ def create_admin_course_router(get_db: Callable, get_current_admin: Callable) ->
                 if response.status_code != 200:
                     raise HTTPException(status_code=500, detail=f"Failed to update course: {response.text}")
                 
-                return response.json()
+                return Response(content=response.content, media_type="application/json")
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
 
@@ -104,7 +104,7 @@ def create_admin_course_router(get_db: Callable, get_current_admin: Callable) ->
                 if response.status_code != 200:
                     raise HTTPException(status_code=500, detail=f"Failed to delete course: {response.text}")
                 
-                return response.json()
+                return Response(content=response.content, media_type="application/json")
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
 
@@ -127,7 +127,7 @@ def create_admin_course_router(get_db: Callable, get_current_admin: Callable) ->
                 if response.status_code != 200:
                     raise HTTPException(status_code=500, detail=f"Failed to import courses: {response.text}")
                 
-                return response.json()
+                return Response(content=response.content, media_type="application/json")
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
 
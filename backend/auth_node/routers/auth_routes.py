@@ -1,35 +1,130 @@
 """Authentication routes for Auth Node - registration, login, 2FA"""
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from sqlalchemy import select, update, bindparam
 from sqlalchemy.orm import Session
-from typing import Callable
+from typing import Callable, Optional
 from datetime import datetime, timedelta, timezone
-import os
-import httpx
+import time
 
 from backend.common import (
-    Student, Teacher, RefreshToken, RegistrationCode,
-    UserCreate, UserLogin, User2FA,
-    AccessTokenResponse, RefreshTokenResponse,
-    verify_password, get_password_hash,
+    Student, Teacher, Admin, RefreshToken, RegistrationCode,
+    UserCreate, UserLogin, User2FA, TOTPSetup,
+    AccessTokenResponse, RefreshTokenResponse, UserResponse, AdminResponse,
+    verify_password_async, get_password_hash_async,
     create_access_token, create_refresh_token, decode_token, hash_token,
     generate_totp_secret, verify_totp, get_totp_uri,
+    TTLCache, get_client_ip, get_current_user_from_token, strip_bearer,
 )
 from backend.common.auth_helpers import (
-    get_user_by_username, get_user_by_id, has_2fa,
+    get_user_by_username, get_user_by_id, get_user_id, get_user_type,
+    has_2fa, get_totp_secret, set_totp_secret, is_active, invalidate_username,
+    get_2fa_status_columns,
 )
 from backend.auth_node.routers.settings_routes import ensure_system_settings
+from backend.auth_node.data_node_outbox import DataNodeOutbox
 
-# Configuration
-DATA_NODE_URL = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
+# Token lifetimes
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+REFRESH_TOKEN_EXPIRES_IN = int(REFRESH_TOKEN_LIFETIME.total_seconds())
+TEACHER_ACCESS_TOKEN_LIFETIME = timedelta(hours=2)  # Longer sessions for managing courses
+TEACHER_ACCESS_TOKEN_EXPIRES_IN = int(TEACHER_ACCESS_TOKEN_LIFETIME.total_seconds())
+ACCESS_TOKEN_EXPIRES_IN = 30 * 60  # Default 30 minutes for students
 
+# Statements reused on every request; SQLAlchemy caches their compiled form
+# against these objects, so handlers only bind parameters.
+_STMT_VALID_REGISTRATION_CODE = select(RegistrationCode).where(
+    RegistrationCode.code == bindparam("code"),
+    RegistrationCode.is_used == False,
+    RegistrationCode.expires_at > bindparam("now"),
+).limit(1)
+_STMT_REFRESH_TOKEN_BY_HASH = select(RefreshToken).where(
+    RefreshToken.token_hash == bindparam("token_hash"),
+).limit(1)
+_STMT_LIVE_REFRESH_TOKEN = select(RefreshToken).where(
+    RefreshToken.token_hash == bindparam("token_hash"),
+    RefreshToken.is_revoked == False,
+).limit(1)
+_STMT_REVOKE_USER_REFRESH_TOKENS = update(RefreshToken).where(
+    RefreshToken.user_id == bindparam("uid"),
+    RefreshToken.is_revoked == False,
+).values(is_revoked=True).execution_options(synchronize_session=False)
+_STMT_ADMIN_BY_ID = select(Admin).where(Admin.admin_id == bindparam("admin_id"))
 
-def create_auth_router(get_db: Callable) -> APIRouter:
+# Recently rejected (client_ip, registration_code) pairs, answered without a DB query
+invalid_registration_codes = TTLCache(maxsize=10_000, ttl=60.0)
+
+def _recent_auth_claim(refresh_payload: dict) -> dict:
+    """Carry the refresh token's password-verification time ("rae") into an access token"""
+    if "rae" in refresh_payload:
+        return {"rae": refresh_payload["rae"]}
+    return {}
+
+
+# Access token (lifetime, expires_in) per user type; teachers get 2 hours for
+# longer sessions managing courses, everyone else the 30 minute default
+_ACCESS_TOKEN_LIFETIMES = {
+    "teacher": (TEACHER_ACCESS_TOKEN_LIFETIME, TEACHER_ACCESS_TOKEN_EXPIRES_IN),
+}
+_DEFAULT_ACCESS_TOKEN_LIFETIME = (None, ACCESS_TOKEN_EXPIRES_IN)
+
+
+def _access_token_response(user, extra_claims: Optional[dict] = None) -> dict:
+    """Issue an access token for user with its type's lifetime"""
+    user_type = get_user_type(user)
+    lifetime, expires_in = _ACCESS_TOKEN_LIFETIMES.get(user_type, _DEFAULT_ACCESS_TOKEN_LIFETIME)
+    access_token = create_access_token({
+        "user_id": get_user_id(user),
+        "username": user.username,
+        "user_type": user_type,
+        **(extra_claims or {}),
+    }, expires_delta=lifetime)
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": expires_in
+    }
+
+
+def _finalize_registration(
+    db: Session, reg_code: RegistrationCode, user_id: int, user_data: UserCreate, user_has_2fa: bool
+) -> str:
+    """Mark the code used and issue the first refresh token for a new user.
+
+    Changes are only flushed; register_v1 commits them together with the
+    user row.
+    """
+    # Mark registration code as used
+    reg_code.is_used = True
+    reg_code.used_by = user_id
+    
+    # Revoke any existing refresh tokens for this user (shouldn't exist for new user, but be safe)
+    db.execute(_STMT_REVOKE_USER_REFRESH_TOKENS, {"uid": user_id})
+    
+    # Generate new refresh token
+    refresh_token = create_refresh_token({
+        "user_id": user_id,
+        "username": user_data.username,
+        "user_type": user_data.user_type,
+        "has_2fa": user_has_2fa,
+    })
+    
+    # Store new refresh token
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_token(refresh_token),
+        expires_at=datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME
+    ))
+    db.flush()
+    return refresh_token
+
+
+def create_auth_router(get_db: Callable, get_data_node_outbox: Callable) -> APIRouter:
     """
     Factory function to create authentication router with injected dependencies.
     
     Args:
         get_db: Database session dependency
+        get_data_node_outbox: Dependency returning the app's DataNodeOutbox
     
     Returns:
         Configured APIRouter instance
@@ -39,9 +134,15 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     @router.post("/register/v1", response_model=dict)
     async def register_v1(
         user_data: UserCreate,
+        request: Request,
+        outbox: DataNodeOutbox = Depends(get_data_node_outbox),
         db: Session = Depends(get_db)
     ):
         """Register user - phase 1: Create account and generate 2FA"""
+        code_key = (get_client_ip(request), user_data.registration_code)
+        if code_key in invalid_registration_codes:
+            raise HTTPException(status_code=400, detail="Invalid or expired registration code")
+        
         # Check system settings for registration availability
         settings = ensure_system_settings(db)
         if user_data.user_type == "student" and not settings.student_registration_enabled:
@@ -53,13 +154,13 @@ def create_auth_router(get_db: Callable) -> APIRouter:
         if not user_data.registration_code:
             raise HTTPException(status_code=400, detail="Registration code is required")
         
-        reg_code = db.query(RegistrationCode).filter(
-            RegistrationCode.code == user_data.registration_code,
-            RegistrationCode.is_used == False,
-            RegistrationCode.expires_at > datetime.now(timezone.utc)
-        ).first()
+        reg_code = db.execute(_STMT_VALID_REGISTRATION_CODE, {
+            "code": user_data.registration_code,
+            "now": datetime.now(timezone.utc),
+        }).scalar_one_or_none()
         
         if not reg_code:
+            invalid_registration_codes.set(code_key, True)
             raise HTTPException(status_code=400, detail="Invalid or expired registration code")
         
         if reg_code.user_type != user_data.user_type:
@@ -74,112 +175,60 @@ def create_auth_router(get_db: Callable) -> APIRouter:
         totp_secret = generate_totp_secret() if user_data.user_type == "student" else None
     
         # Create password hash
-        password_hash = get_password_hash(user_data.password)
+        password_hash = await get_password_hash_async(user_data.password)
     
-        # Create user in auth database
-        user_id = None
+        # Create user in auth database. The record is flushed to obtain its ID
+        # for the data node record.
         if user_data.user_type == "student":
             # Create student auth record
-            new_student = Student(
+            new_user = Student(
                 username=user_data.username,
                 password_hash=password_hash,
                 totp_secret=totp_secret,
                 is_active=True
             )
-            db.add(new_student)
-            db.commit()
-            db.refresh(new_student)
-            user_id = new_student.student_id
+            db.add(new_user)
+            db.flush()
+            user_id = new_user.student_id
     
             # Also create student course data record in data node
-            data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-            internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
-    
-            import httpx
-            async with httpx.AsyncClient() as client:
-                headers = {"Internal-Token": internal_token}
-                # Apply tags from registration code if available
-                student_tags = []
-                if user_data.registration_code and reg_code:
-                    student_tags = reg_code.code_tags or []
-                
-                student_payload = {
-                    "student_id": user_id,  # Sync student_id from auth to course data
-                    "student_name": user_data.username,  # Set to username initially
-                    "student_tags": student_tags
-                }
-                response = await client.post(f"{data_node_url}/add/student", json=student_payload, headers=headers)
-                if response.status_code != 201:
-                    # Rollback auth record if course data creation fails
-                    db.delete(new_student)
-                    db.commit()
-                    raise HTTPException(status_code=500, detail=f"Failed to create student course data: {response.text}")
-    
+            data_node_path = "/add/student"
+            data_node_payload = {
+                "student_id": user_id,  # Sync student_id from auth to course data
+                "student_name": user_data.username,  # Set to username initially
+                "student_tags": reg_code.code_tags or []  # Apply tags from registration code
+            }
         elif user_data.user_type == "teacher":
             # Create teacher auth record
-            new_teacher = Teacher(
+            new_user = Teacher(
                 username=user_data.username,
                 password_hash=password_hash,
                 is_active=True
             )
-            db.add(new_teacher)
-            db.commit()
-            db.refresh(new_teacher)
-            user_id = new_teacher.teacher_id
+            db.add(new_user)
+            db.flush()
+            user_id = new_user.teacher_id
     
             # Also create teacher course data record in data node
-            data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-            internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
-    
-            import httpx
-            async with httpx.AsyncClient() as client:
-                headers = {"Internal-Token": internal_token}
-                teacher_payload = {
-                    "teacher_id": user_id,  # Sync teacher_id from auth to course data
-                    "teacher_name": user_data.username  # Set to username initially
-                }
-                response = await client.post(f"{data_node_url}/add/teacher", json=teacher_payload, headers=headers)
-                if response.status_code != 201:
-                    # Rollback auth record if course data creation fails
-                    db.delete(new_teacher)
-                    db.commit()
-                    raise HTTPException(status_code=500, detail=f"Failed to create teacher course data: {response.text}")
+            data_node_path = "/add/teacher"
+            data_node_payload = {
+                "teacher_id": user_id,  # Sync teacher_id from auth to course data
+                "teacher_name": user_data.username  # Set to username initially
+            }
         else:
             raise HTTPException(status_code=400, detail="Invalid user type")
     
         if not user_id:
             raise HTTPException(status_code=500, detail="Failed to create user")
         
-        # Mark registration code as used
-        if user_data.registration_code:
-            reg_code.is_used = True
-            reg_code.used_by = user_id
-            db.commit()
-        
-        # Revoke any existing refresh tokens for this user (shouldn't exist for new user, but be safe)
-        existing_tokens = db.query(RefreshToken).filter(
-            RefreshToken.user_id == user_id,
-            RefreshToken.is_revoked == False
-        ).all()
-        for token in existing_tokens:
-            token.is_revoked = True
-        
-        # Generate new refresh token
-        refresh_token = create_refresh_token({
-            "user_id": user_id,
-            "username": user_data.username,
-            "user_type": user_data.user_type
-        })
-        
-        # Store new refresh token
-        token_hash = hash_token(refresh_token)
-        db_token = RefreshToken(
-            user_id=user_id,
-            token_hash=token_hash,
-            expires_at=datetime.now(timezone.utc) + timedelta(days=7)
-        )
-        db.add(db_token)
+        # Queue the course data record in the same transaction as the user, so
+        # both commit or neither does; the outbox delivers it after commit and
+        # no network call is made while the write transaction is open
+        outbox.add(db, data_node_path, data_node_payload)
+        refresh_token = _finalize_registration(db, reg_code, user_id, user_data, has_2fa(new_user))
         db.commit()
+        invalidate_username(user_data.username)
+        outbox.wake()
         
         # Get TOTP URI for QR code (only for students)
         totp_uri = get_totp_uri(totp_secret, user_data.username) if totp_secret else None
@@ -188,7 +237,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
             "totp_secret": totp_secret,
             "totp_uri": totp_uri,
             "refresh_token": refresh_token,
-            "expires_in": 7 * 24 * 3600,
+            "expires_in": REFRESH_TOKEN_EXPIRES_IN,
             "message": "Registration successful. Please scan QR code to setup 2FA."
         }
     
@@ -201,7 +250,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Register user - phase 2: Verify 2FA and get access token"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -216,30 +265,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
                 if not verify_totp(get_totp_secret(user), totp_data.totp_code):
                     raise HTTPException(status_code=400, detail="Invalid 2FA code")
             
-            # Generate access token with different expiration based on user type
-            from datetime import timedelta
-            if get_user_type(user) == "teacher":
-                # Teachers get 2 hours for longer sessions managing courses
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                }, expires_delta=timedelta(hours=2))
-                expires_in = 2 * 3600  # 2 hours in seconds
-            else:
-                # Default 30 minutes for students and other user types
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                })
-                expires_in = 30 * 60  # 30 minutes in seconds
-            
-            return {
-                "access_token": access_token,
-                "token_type": "bearer",
-                "expires_in": expires_in
-            }
+            return _access_token_response(user)
         except Exception as e:
             raise HTTPException(status_code=401, detail=str(e))
     
@@ -252,25 +278,22 @@ def create_auth_router(get_db: Callable) -> APIRouter:
         """Login phase 1: Verify credentials and get refresh token"""
         user = get_user_by_username(db, login_data.username)
         
-        if not user or not verify_password(login_data.password, user.password_hash):
+        if not user or not await verify_password_async(login_data.password, user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         if not is_active(user):
             raise HTTPException(status_code=403, detail="Account is inactive")
         
-        # Revoke any existing refresh tokens for this user
-        existing_tokens = db.query(RefreshToken).filter(
-            RefreshToken.user_id == get_user_id(user),
-            RefreshToken.is_revoked == False
-        ).all()
-        for token in existing_tokens:
-            token.is_revoked = True
+        # Revoke any existing refresh tokens for this user in a single UPDATE
+        db.execute(_STMT_REVOKE_USER_REFRESH_TOKENS, {"uid": get_user_id(user)})
         
         # Generate new refresh token
         refresh_token = create_refresh_token({
             "user_id": get_user_id(user),
             "username": user.username,
-            "user_type": get_user_type(user)
+            "user_type": get_user_type(user),
+            "has_2fa": has_2fa(user),
+            "rae": int(time.time()),
         })
         
         # Store new refresh token
@@ -278,14 +301,14 @@ def create_auth_router(get_db: Callable) -> APIRouter:
         db_token = RefreshToken(
             user_id=get_user_id(user),
             token_hash=token_hash,
-            expires_at=datetime.now(timezone.utc) + timedelta(days=7)
+            expires_at=datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME
         )
         db.add(db_token)
         db.commit()
         
         return {
             "refresh_token": refresh_token,
-            "expires_in": 7 * 24 * 3600
+            "expires_in": REFRESH_TOKEN_EXPIRES_IN
         }
     
     
@@ -297,7 +320,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Login phase 2: Verify 2FA and get access token"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -312,30 +335,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
                 if not verify_totp(get_totp_secret(user), totp_data.totp_code):
                     raise HTTPException(status_code=400, detail="Invalid 2FA code")
             
-            # Generate access token with different expiration based on user type
-            from datetime import timedelta
-            if get_user_type(user) == "teacher":
-                # Teachers get 2 hours for longer sessions managing courses
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                }, expires_delta=timedelta(hours=2))
-                expires_in = 2 * 3600  # 2 hours in seconds
-            else:
-                # Default 30 minutes for students and other user types
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                })
-                expires_in = 30 * 60  # 30 minutes in seconds
-            
-            return {
-                "access_token": access_token,
-                "token_type": "bearer",
-                "expires_in": expires_in
-            }
+            return _access_token_response(user, _recent_auth_claim(payload))
         except Exception as e:
             raise HTTPException(status_code=401, detail=str(e))
     
@@ -347,23 +347,24 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Check if user has 2FA enabled"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
                 raise HTTPException(status_code=401, detail="Invalid refresh token")
             
-            user = get_user_by_id(db, payload.get("user_id"), payload.get("user_type"))
-            if not user:
+            # Read the flag from the database: 2FA can be enabled or disabled
+            # after the refresh token was issued, so its has_2fa claim may be
+            # stale. Only the two needed columns are loaded.
+            user_type = payload.get("user_type")
+            row = get_2fa_status_columns(db, payload.get("user_id"), user_type)
+            if not row:
                 raise HTTPException(status_code=404, detail="User not found")
             
-            # Check if user has 2FA enabled (only for students)
-            user_has_2fa = has_2fa(user)
-            
             return {
-                "has_2fa": user_has_2fa,
-                "user_type": get_user_type(user),
-                "username": user.username
+                "has_2fa": row[0],
+                "user_type": user_type,
+                "username": row[1]
             }
         except Exception as e:
             raise HTTPException(status_code=401, detail=str(e))
@@ -376,7 +377,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Login without 2FA for teachers only (students must have 2FA)"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -394,28 +395,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
             if get_user_type(user) == "teacher" and has_2fa(user):
                 raise HTTPException(status_code=400, detail="User has 2FA enabled, cannot use this endpoint")
             
-            # Generate access token with different expiration based on user type
-            from datetime import timedelta
-            if get_user_type(user) == "teacher":
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                }, expires_delta=timedelta(hours=2))
-                expires_in = 2 * 3600
-            else:
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                })
-                expires_in = 30 * 60
-            
-            return {
-                "access_token": access_token,
-                "token_type": "bearer",
-                "expires_in": expires_in
-            }
+            return _access_token_response(user, _recent_auth_claim(payload))
         except Exception as e:
             raise HTTPException(status_code=401, detail=str(e))
     
@@ -427,12 +407,12 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Logout - revoke refresh token"""
         try:
-            token = authorization.replace("Bearer ", "")
+            token = strip_bearer(authorization)
             token_hash = hash_token(token)
             
-            db_token = db.query(RefreshToken).filter(
-                RefreshToken.token_hash == token_hash
-            ).first()
+            db_token = db.execute(
+                _STMT_REFRESH_TOKEN_BY_HASH, {"token_hash": token_hash}
+            ).scalar_one_or_none()
             
             if db_token:
                 db_token.is_revoked = True
@@ -450,7 +430,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Setup 2FA for student without 2FA - phase 1: Generate TOTP secret"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -485,13 +465,13 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     
     @router.post("/setup/2fa/v2")
     async def setup_2fa_v2(
-        setup_data: dict,
+        setup_data: TOTPSetup,
         authorization: str = Header(..., alias="Authorization"),
         db: Session = Depends(get_db)
     ):
         """Setup 2FA for student - phase 2: Verify TOTP and save secret"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -505,15 +485,11 @@ def create_auth_router(get_db: Callable) -> APIRouter:
             if get_user_type(user) != "student":
                 raise HTTPException(status_code=400, detail="Only students can setup 2FA")
             
-            # Get secret and code from request
-            totp_secret = setup_data.get("totp_secret")
-            totp_code = setup_data.get("totp_code")
-            
-            if not totp_secret or not totp_code:
-                raise HTTPException(status_code=400, detail="Missing totp_secret or totp_code")
+            # Secret and code are validated by the TOTPSetup schema
+            totp_secret = setup_data.totp_secret
             
             # Verify the TOTP code with the provided secret
-            if not verify_totp(totp_secret, totp_code):
+            if not verify_totp(totp_secret, setup_data.totp_code):
                 raise HTTPException(status_code=400, detail="Invalid 2FA code")
             
             # Save the TOTP secret to the user
@@ -538,7 +514,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Refresh access token (requires 2FA for students)"""
         try:
-            refresh_token = authorization.replace("Bearer ", "")
+            refresh_token = strip_bearer(authorization)
             payload = decode_token(refresh_token)
             
             if not payload or payload.get("type") != "refresh":
@@ -546,10 +522,9 @@ def create_auth_router(get_db: Callable) -> APIRouter:
             
             # Check if token is revoked
             token_hash = hash_token(refresh_token)
-            db_token = db.query(RefreshToken).filter(
-                RefreshToken.token_hash == token_hash,
-                RefreshToken.is_revoked == False
-            ).first()
+            db_token = db.execute(
+                _STMT_LIVE_REFRESH_TOKEN, {"token_hash": token_hash}
+            ).scalar_one_or_none()
             
             if not db_token:
                 raise HTTPException(status_code=401, detail="Token revoked or not found")
@@ -563,30 +538,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
                 if not verify_totp(get_totp_secret(user), totp_data.totp_code):
                     raise HTTPException(status_code=400, detail="Invalid 2FA code")
             
-            # Generate new access token with different expiration based on user type
-            from datetime import timedelta
-            if get_user_type(user) == "teacher":
-                # Teachers get 2 hours for longer sessions managing courses
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                }, expires_delta=timedelta(hours=2))
-                expires_in = 2 * 3600  # 2 hours in seconds
-            else:
-                # Default 30 minutes for students and other user types
-                access_token = create_access_token({
-                    "user_id": get_user_id(user),
-                    "username": user.username,
-                    "user_type": get_user_type(user)
-                })
-                expires_in = 30 * 60  # 30 minutes in seconds
-            
-            return {
-                "access_token": access_token,
-                "token_type": "bearer",
-                "expires_in": expires_in
-            }
+            return _access_token_response(user)
         except Exception as e:
             raise HTTPException(status_code=401, detail=str(e))
     
@@ -598,7 +550,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     ):
         """Get user information from access token"""
         try:
-            token = authorization.replace("Bearer ", "")
+            token = strip_bearer(authorization)
             payload = await get_current_user_from_token(token)
     
             user_id = payload.get("user_id")
@@ -606,7 +558,7 @@ def create_auth_router(get_db: Callable) -> APIRouter:
     
             if user_type == "admin":
                 # Look up admin user
-                admin = db.query(Admin).filter(Admin.admin_id == user_id).first()
+                admin = db.execute(_STMT_ADMIN_BY_ID, {"admin_id": user_id}).scalar_one_or_none()
                 if not admin:
                     raise HTTPException(status_code=404, detail="Admin not found")
                 
@@ -43,12 +43,7 @@ def create_settings_router(get_db: Callable, get_current_admin: Callable) -> API
         db: Session = Depends(get_db)
     ):
         """Get system settings (admin only)"""
-        settings = ensure_system_settings(db)
-        return SystemSettingsResponse(
-            student_registration_enabled=settings.student_registration_enabled,
-            teacher_registration_enabled=settings.teacher_registration_enabled,
-            updated_at=settings.updated_at
-        )
+        return ensure_system_settings(db)
 
     @router.put("/admin/settings", response_model=SystemSettingsResponse)
     async def update_system_settings(
@@ -68,10 +63,6 @@ def create_settings_router(get_db: Callable, get_current_admin: Callable) -> API
         db.commit()
         db.refresh(settings)
         
-        return SystemSettingsResponse(
-            student_registration_enabled=settings.student_registration_enabled,
-            teacher_registration_enabled=settings.teacher_registration_enabled,
-            updated_at=settings.updated_at
-        )
+        return settings
 
     return router
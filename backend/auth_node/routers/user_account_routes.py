@@ -1,75 +1,163 @@
 """User account management routes for Auth Node - password and 2FA"""
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
-from typing import Callable
+from typing import Any, Callable, Tuple
+import asyncio
+import hashlib
+import hmac
+import time
+import orjson
 
 from backend.common import (
     PasswordChangeRequest, TwoFASetupRequest, TwoFAVerifyRequest, TwoFADisableRequest,
-    get_current_user_from_token,
-    verify_password, get_password_hash,
+    verify_password_async, get_password_hash_async,
     generate_totp_secret, verify_totp, get_totp_uri,
+    TTLCache, SingleFlight, ORJSONResponse,
 )
 from backend.common.auth_helpers import (
-    get_user_by_id, has_2fa, get_totp_secret as get_user_totp_secret,
+    get_user_by_id, get_2fa_status_columns, has_2fa, get_totp_secret as get_user_totp_secret, USER_MODELS,
 )
+from backend.common.security import SECRET_KEY
 
+# Only these account types have 2FA columns
+_2FA_USER_TYPES = ("student", "teacher")
 
-def create_user_account_router(get_db: Callable) -> APIRouter:
+
+def _update_by_id(user_type: str):
+    """UPDATE on the user_type's table for the row whose id is bound as "uid" """
+    model, id_column = USER_MODELS[user_type]
+    return update(model).where(id_column == bindparam("uid")).execution_options(synchronize_session=False)
+
+
+# 2FA enable/disable statements, built once per user type
+_ENABLE_2FA = {
+    user_type: _update_by_id(user_type).values(totp_secret=bindparam("secret"), has_2fa=True)
+    for user_type in _2FA_USER_TYPES
+}
+_DISABLE_2FA = {
+    user_type: _update_by_id(user_type).values(totp_secret=None, has_2fa=False)
+    for user_type in _2FA_USER_TYPES
+}
+
+# setup_2fa skips the password check when the access token was issued from a
+# login whose password was verified at most this many seconds ago ("rae"
+# claim). Anyone holding such a token can start 2FA setup without the
+# password for this long, so keep the window short.
+RECENT_AUTH_SECONDS = 60
+
+# In-flight get_2fa_status lookups, keyed by (user_id, user_type)
+_status_lookups = SingleFlight()
+
+
+def _load_2fa_status(session_factory: Callable, user_id: int, user_type: str):
+    """get_2fa_status_columns in a session of its own. The lookup is shared
+    by concurrent requests, so it must not use any one request's session."""
+    with session_factory() as db:
+        return get_2fa_status_columns(db, user_id, user_type)
+
+# Static success bodies, serialised once at import
+_PASSWORD_CHANGED = orjson.dumps({"success": True, "message": "Password changed successfully"})
+_2FA_VERIFIED = orjson.dumps({"success": True, "message": "2FA verified successfully"})
+_2FA_DISABLED = orjson.dumps({"success": True, "message": "2FA disabled successfully"})
+
+# Recent password verification results, so a retried or double-submitted
+# request does not pay for the KDF again. Keys hold an HMAC of the password
+# (never the password itself) plus the stored hash, so a password change
+# invalidates them.
+_verify_cache = TTLCache(maxsize=512, ttl=5.0)
+_VERIFY_CACHE_KEY = SECRET_KEY.encode()
+
+
+async def _verify_cached(user_id: int, user_type: str, password: str, stored_hash: str) -> bool:
+    """Password verification (off the event loop) with a short-lived per-user result cache"""
+    pw_hmac = hmac.new(_VERIFY_CACHE_KEY, password.encode(), hashlib.sha256).digest()
+    key = (user_id, user_type, pw_hmac, stored_hash)
+    result = _verify_cache.get(key)
+    if result is None:
+        result = await verify_password_async(password, stored_hash)
+        _verify_cache.set(key, result)
+    return result
+
+
+def _user_claims(payload: dict) -> Tuple[int, str]:
+    """Return the mandatory (user_id, user_type) claims of an access token payload"""
+    try:
+        return payload["user_id"], payload["user_type"]
+    except KeyError:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+
+def create_user_account_router(get_db: Callable, session_factory: Callable) -> APIRouter:
     """
     Factory function to create user account router with injected dependencies.
     
+    The routes read the decoded access token from request.state.user, so the
+    app must install JWTMiddleware for the /user/ prefix.
+    
     Args:
         get_db: Database session dependency
+        session_factory: Session factory for lookups shared between requests
     
     Returns:
         Configured APIRouter instance
     """
-    router = APIRouter()
+    router = APIRouter(default_response_class=ORJSONResponse)
+
+    async def get_current_account(
+        request: Request,
+        db: Session = Depends(get_db)
+    ) -> Tuple[int, str, Any]:
+        """Resolve the access token to (user_id, user_type, user row)"""
+        user_id, user_type = _user_claims(request.state.user)
+        user = get_user_by_id(db, user_id, user_type)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user_id, user_type, user
 
     @router.post("/user/change-password")
     async def change_password(
         password_change: PasswordChangeRequest,
-        current_user: dict = Depends(get_current_user_from_token),
+        account: Tuple[int, str, Any] = Depends(get_current_account),
         db: Session = Depends(get_db)
     ):
         """Change user password (requires old password verification)"""
-        user_id = current_user.get("user_id")
-        user_type = current_user.get("user_type")
-        
-        # Get user from database
-        user = get_user_by_id(db, user_id, user_type)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        user_id, user_type, user = account
         
         # Verify old password
-        if not verify_password(password_change.old_password, user.password_hash):
+        if not await _verify_cached(user_id, user_type, password_change.old_password, user.password_hash):
             raise HTTPException(status_code=400, detail="Incorrect old password")
-        
+
+        # Unchanged password: the stored hash is already right, skip the KDF
+        if password_change.new_password == password_change.old_password:
+            return Response(content=_PASSWORD_CHANGED, media_type="application/json")
+
         # Update password
-        user.password_hash = get_password_hash(password_change.new_password)
+        user.password_hash = await get_password_hash_async(password_change.new_password)
         db.commit()
         
-        return {"success": True, "message": "Password changed successfully"}
+        return Response(content=_PASSWORD_CHANGED, media_type="application/json")
 
     @router.post("/user/2fa/setup")
     async def setup_2fa(
+        request: Request,
         setup_request: TwoFASetupRequest,
-        current_user: dict = Depends(get_current_user_from_token),
+        account: Tuple[int, str, Any] = Depends(get_current_account),
         db: Session = Depends(get_db)
     ):
         """Setup 2FA for user (verify password first)"""
-        user_id = current_user.get("user_id")
-        user_type = current_user.get("user_type")
+        user_id, user_type, user = account
         
-        # Get user from database
-        user = get_user_by_id(db, user_id, user_type)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Verify password
-        if not verify_password(setup_request.password, user.password_hash):
+        # Verify password, unless the user has only just logged in with it
+        recently_authenticated = request.state.user.get("rae", 0) > time.time() - RECENT_AUTH_SECONDS
+        if not recently_authenticated and not await _verify_cached(
+            user_id, user_type, setup_request.password, user.password_hash
+        ):
             raise HTTPException(status_code=400, detail="Incorrect password")
         
+        if user_type not in _2FA_USER_TYPES:
+            raise HTTPException(status_code=400, detail=f"2FA is not available for {user_type} accounts")
+        
         # Check if 2FA is already enabled
         if has_2fa(user):
             raise HTTPException(status_code=400, detail="2FA is already enabled")
@@ -79,18 +167,14 @@ def create_user_account_router(get_db: Callable) -> APIRouter:
         
         # Generate QR code URI
         totp_uri = get_totp_uri(
-            secret=totp_secret,
+            totp_secret,
+            user_type + ":" + user.username,
             issuer="Course Selection System",
-            account_name=f"{user_type}:{user.username}"
         )
         
         # Temporarily store secret (will be confirmed in verify endpoint)
         # For now, store it directly - in production, might want to use a temporary storage
-        user.totp_secret = totp_secret
-        if user_type == "student":
-            user.has_2fa = True
-        elif user_type == "teacher" and hasattr(user, 'has_2fa'):
-            user.has_2fa = True
+        db.execute(_ENABLE_2FA[user_type], {"uid": user_id, "secret": totp_secret})
         db.commit()
         
         return {
@@ -103,90 +187,68 @@ def create_user_account_router(get_db: Callable) -> APIRouter:
     @router.post("/user/2fa/verify")
     async def verify_2fa_setup(
         verify_request: TwoFAVerifyRequest,
-        current_user: dict = Depends(get_current_user_from_token),
-        db: Session = Depends(get_db)
+        account: Tuple[int, str, Any] = Depends(get_current_account)
     ):
         """Verify 2FA setup with TOTP code"""
-        user_id = current_user.get("user_id")
-        user_type = current_user.get("user_type")
-        
-        # Get user from database
-        user = get_user_by_id(db, user_id, user_type)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        _, _, user = account
         
         # Verify the TOTP code
-        if not get_user_totp_secret(user):
+        secret = get_user_totp_secret(user)
+        if not secret:
             raise HTTPException(status_code=400, detail="2FA not set up")
         
-        if not verify_totp(get_user_totp_secret(user), verify_request.totp_code):
+        if not verify_totp(secret, verify_request.totp_code):
             raise HTTPException(status_code=400, detail="Invalid 2FA code")
         
-        return {
-            "success": True,
-            "message": "2FA verified successfully"
-        }
+        return Response(content=_2FA_VERIFIED, media_type="application/json")
 
     @router.post("/user/2fa/disable")
     async def disable_2fa(
         disable_request: TwoFADisableRequest,
-        current_user: dict = Depends(get_current_user_from_token),
+        account: Tuple[int, str, Any] = Depends(get_current_account),
         db: Session = Depends(get_db)
     ):
         """Disable 2FA for user (requires password and current 2FA code)"""
-        user_id = current_user.get("user_id")
-        user_type = current_user.get("user_type")
+        user_id, user_type, user = account
         
-        # Get user from database
-        user = get_user_by_id(db, user_id, user_type)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Verify password
-        if not verify_password(disable_request.password, user.password_hash):
+        # Verify password and 2FA code concurrently (they are independent)
+        secret = get_user_totp_secret(user)
+        password_ok, totp_ok = await asyncio.gather(
+            _verify_cached(user_id, user_type, disable_request.password, user.password_hash),
+            asyncio.to_thread(verify_totp, secret, disable_request.totp_code),
+        )
+        if not password_ok:
             raise HTTPException(status_code=400, detail="Incorrect password")
         
-        # Verify 2FA code
-        if not has_2fa(user):
+        if not has_2fa(user) or not secret:
             raise HTTPException(status_code=400, detail="2FA is not enabled")
         
-        if not verify_totp(get_user_totp_secret(user), disable_request.totp_code):
+        if not totp_ok:
             raise HTTPException(status_code=400, detail="Invalid 2FA code")
         
         # Disable 2FA
-        user.totp_secret = None
-        if user_type == "student":
-            user.has_2fa = False
-        elif user_type == "teacher" and hasattr(user, 'has_2fa'):
-            user.has_2fa = False
+        db.execute(_DISABLE_2FA[user_type], {"uid": user_id})
         db.commit()
         
-        return {"success": True, "message": "2FA disabled successfully"}
+        return Response(content=_2FA_DISABLED, media_type="application/json")
 
     @router.get("/user/2fa/status")
-    async def get_2fa_status(
-        authorization: str = Header(..., alias="Authorization"),
-        db: Session = Depends(get_db)
-    ):
+    async def get_2fa_status(request: Request):
         """Get current user's 2FA status"""
-        try:
-            token = authorization.replace("Bearer ", "")
-            payload = await get_current_user_from_token(token)
-            
-            user_id = payload.get("user_id")
-            user_type = payload.get("user_type")
-            
-            # Get user from database
-            user = get_user_by_id(db, user_id, user_type)
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            
-            return {
-                "has_2fa": has_2fa(user),
-                "user_type": user_type,
-                "username": user.username
-            }
-        except Exception as e:
-            raise HTTPException(status_code=401, detail=str(e))
+        user_id, user_type = _user_claims(request.state.user)
+        
+        # Only the two columns needed, not the full user row. Concurrent
+        # requests for the same user share one lookup.
+        row = await _status_lookups.do(
+            (user_id, user_type), asyncio.to_thread, _load_2fa_status, session_factory, user_id, user_type
+        )
+        if not row:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        return {
+            "has_2fa": row[0],
+            "user_type": user_type,
+            "username": row[1]
+        }
 
     return router
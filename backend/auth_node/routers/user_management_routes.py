@@ -1,25 +1,196 @@
 """User management routes for Auth Node - admin user operations"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+from sqlalchemy import bindparam, func, literal, null, select, union_all, update
 from sqlalchemy.orm import Session
-from typing import Optional, List, Callable
+from typing import Optional, List, Callable, Dict, Iterable
 from datetime import datetime, timezone
 import os
+import asyncio
+import csv
+import io
+import string
 import httpx
+import orjson
 
 from backend.common import (
     Admin, Student, Teacher, AvailableTag,
-    verify_password, get_password_hash,
+    verify_password, get_password_hash, generate_totp_secret,
+    TTLCache, SingleFlight,
 )
 from backend.common.auth_helpers import (
-    get_user_by_username, get_user_by_id, get_user_type, get_user_id,
+    get_user_by_username, get_user_by_id, get_user_type, get_user_id, set_totp_secret, create_admin,
+    invalidate_username, invalidate_admin,
+    USER_MODELS,
 )
+from backend.auth_node.data_node_outbox import DataNodeOutbox
 
-# Configuration
-DATA_NODE_URL = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
+# Data node tag updates in flight at once during a batch tag import
+TAG_UPDATE_CONCURRENCY = 32
 
+# Available tags change rarely; cache them briefly per tag_type
+AVAILABLE_TAGS_TTL = 30
+available_tags_cache = TTLCache(maxsize=16, ttl=AVAILABLE_TAGS_TTL)
+available_tags_lookups = SingleFlight()
+# Bumped on every invalidation. Lookups are keyed by it, so a data node call
+# started before a tag update is neither joined nor cached afterwards.
+_available_tags_generation = 0
 
-def create_user_management_router(get_db: Callable, verify_admin_or_internal: Callable, get_current_admin: Callable) -> APIRouter:
+
+def _invalidate_available_tags():
+    """Drop cached available tags after student tags change on the data node"""
+    global _available_tags_generation
+    _available_tags_generation += 1
+    available_tags_cache.clear()
+
+
+# Generated passwords
+GENERATED_PASSWORD_LENGTH = 12
+GENERATED_PASSWORD_ALPHABET = string.ascii_letters + string.digits
+RESET_PASSWORD_ALPHABET = GENERATED_PASSWORD_ALPHABET + "!@#$%&*"
+
+
+def _generate_password(alphabet: str, length: int = GENERATED_PASSWORD_LENGTH) -> str:
+    """Random password drawn from alphabet.
+
+    Randomness comes from one os.urandom read per password rather than one
+    per character. Bytes beyond the largest multiple of len(alphabet) are
+    rejected, so every character stays equally likely.
+    """
+    limit = 256 - 256 % len(alphabet)
+    chars = []
+    while len(chars) < length:
+        chars.extend(alphabet[b % len(alphabet)] for b in os.urandom(2 * length) if b < limit)
+    return "".join(chars[:length])
+
+
+def _user_listing(user_type: str, user_id, username, is_active, totp_secret, created_at, updated_at):
+    """Project one user table onto the common columns list_users merges and returns"""
+    return select(
+        literal(user_type).label("user_type"),
+        user_id.label("user_id"),
+        username.label("username"),
+        is_active.label("is_active"),
+        totp_secret.label("totp_secret"),
+        created_at.label("created_at"),
+        updated_at.label("updated_at"),
+    )
+
+
+# Per-type listings, merged with UNION ALL when listing every type. Students
+# come first so the merged columns take their (fully typed) column types.
+# Only students expose a TOTP secret, and admins have no is_active or
+# updated_at columns.
+_USER_LISTINGS = {
+    "student": _user_listing(
+        "student", Student.student_id, Student.username, Student.is_active,
+        Student.totp_secret, Student.created_at, Student.updated_at,
+    ),
+    "teacher": _user_listing(
+        "teacher", Teacher.teacher_id, Teacher.username, Teacher.is_active,
+        null(), Teacher.created_at, Teacher.updated_at,
+    ),
+    "admin": _user_listing(
+        "admin", Admin.admin_id, Admin.username, literal(True),
+        null(), Admin.created_at, null(),
+    ),
+}
+
+
+# Which table owns a bare user_id, in one round trip. An id can exist in more
+# than one table, so the lowest priority (students, then teachers, then
+# admins) wins, matching the order the tables used to be probed in.
+_owner_candidates = union_all(*(
+    select(literal(user_type).label("user_type"), literal(priority).label("priority"))
+    .where(id_column == bindparam("uid"))
+    for priority, (user_type, (_, id_column)) in enumerate(USER_MODELS.items())
+)).subquery()
+_USER_OWNER = (
+    select(_owner_candidates.c.user_type)
+    .order_by(_owner_candidates.c.priority)
+    .limit(1)
+)
+# The user shown for a username, in one round trip. The same username can
+# exist in more than one table; admins, then students, then teachers win,
+# matching get_user_by_username's probe order.
+_by_username_candidates = union_all(*(
+    _USER_LISTINGS[user_type]
+    .add_columns(literal(priority).label("priority"))
+    .where(model.username == bindparam("uname"))
+    for priority, (user_type, model) in enumerate((("admin", Admin), ("student", Student), ("teacher", Teacher)))
+)).subquery()
+_USER_BY_USERNAME = (
+    select(
+        _by_username_candidates.c.user_type,
+        _by_username_candidates.c.user_id,
+        _by_username_candidates.c.username,
+        _by_username_candidates.c.is_active,
+    )
+    .order_by(_by_username_candidates.c.priority)
+    .limit(1)
+)
+# The same lookup limited to one user type: a single-table probe, no UNION
+_USER_BY_USERNAME_OF_TYPE = {
+    user_type: listing.where(USER_MODELS[user_type][0].username == bindparam("uname")).limit(1)
+    for user_type, listing in _USER_LISTINGS.items()
+}
+# Whether a student or a teacher already uses a username
+_STUDENT_OR_TEACHER_USERNAME = union_all(
+    select(Student.student_id).where(Student.username == bindparam("uname")),
+    select(Teacher.teacher_id).where(Teacher.username == bindparam("uname")),
+)
+# Admin-side single-row updates, built once per user type. RETURNING reports
+# whether a row matched, so no SELECT or ORM load is needed first. Admins have
+# no is_active column.
+_RESET_PASSWORD = {
+    user_type: update(model)
+    .where(model.username == bindparam("uname"))
+    .values(password_hash=bindparam("new_hash"))
+    .returning(id_column)
+    .execution_options(synchronize_session=False)
+    for user_type, (model, id_column) in USER_MODELS.items()
+}
+_SET_ACTIVE = {
+    user_type: update(model)
+    .where(id_column == bindparam("uid"))
+    .values(is_active=bindparam("active"))
+    .returning(id_column)
+    .execution_options(synchronize_session=False)
+    for user_type, (model, id_column) in USER_MODELS.items()
+    if user_type != "admin"
+}
+
+# Student IDs per data node /get/students request (the data node accepts at
+# most 1000, and fewer keeps the query string short)
+STUDENT_TAGS_CHUNK_SIZE = 200
+
+
+async def _fetch_student_tags(client: httpx.AsyncClient, student_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Fetch tags for many students from the data node, a chunk of IDs per request.
+
+    Students the data node does not know are absent from the result. A failed
+    request raises httpx.HTTPError rather than reporting every student as untagged.
+    """
+    student_ids = list(student_ids)
+    
+    async def fetch_chunk(chunk: List[int]) -> list:
+        response = await client.get("/get/students", params=[("student_ids", student_id) for student_id in chunk])
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    chunks = await asyncio.gather(*(
+        fetch_chunk(student_ids[start:start + STUDENT_TAGS_CHUNK_SIZE])
+        for start in range(0, len(student_ids), STUDENT_TAGS_CHUNK_SIZE)
+    ))
+    return {row["student_id"]: row.get("student_tags", []) for rows in chunks for row in rows}
+
+
+def create_user_management_router(
+    get_db: Callable,
+    verify_admin_or_internal: Callable,
+    get_current_admin: Callable,
+    get_http_client: Callable,
+    get_data_node_outbox: Callable,
+) -> APIRouter:
     """
     Factory function to create user management router with injected dependencies.
     
@@ -27,6 +198,9 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
         get_db: Database session dependency
         verify_admin_or_internal: Admin or internal auth dependency
         get_current_admin: Admin authentication dependency
+        get_http_client: Dependency returning the app's shared data node httpx.AsyncClient
+            (configured with the data node base URL and Internal-Token header)
+        get_data_node_outbox: Dependency returning the app's DataNodeOutbox
     
     Returns:
         Configured APIRouter instance
@@ -40,117 +214,53 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
         page_size: int = 20,
         search: str = "",
         _: None = Depends(verify_admin_or_internal),
+        client: httpx.AsyncClient = Depends(get_http_client),
         db: Session = Depends(get_db)
     ):
         """List all users (admin or internal service only)"""
-        all_users_data = []
-        total = 0
-        
-        # Get admin users from local database
-        if not user_type or user_type == "admin":
-            query_admins = db.query(Admin)
-            if search:
-                query_admins = query_admins.filter(Admin.username.contains(search))
-            total_admins = query_admins.count()
-            
-            # Apply pagination only if filtering by admin type specifically
-            if user_type == "admin":
-                db_admins = query_admins.order_by(Admin.created_at.desc()).offset((page-1)*page_size).limit(page_size).all()
-            else:
-                db_admins = query_admins.order_by(Admin.created_at.desc()).all()
-            
-            for admin in db_admins:
-                all_users_data.append({
-                    "user_id": admin.admin_id,
-                    "username": admin.username,
-                    "user_type": "admin",
-                    "is_active": True,
-                    "totp_secret": None,
-                    "created_at": admin.created_at.isoformat() if admin.created_at else None,
-                    "updated_at": None,
-                })
-            total += total_admins
-        
-        # Get students from local auth database
-        if not user_type or user_type == "student":
-            query_students = db.query(Student)
-            if search:
-                query_students = query_students.filter(Student.username.contains(search))
-            total_students = query_students.count()
-            
-            # Apply pagination only if filtering by student type specifically
-            if user_type == "student":
-                db_students = query_students.order_by(Student.created_at.desc()).offset((page-1)*page_size).limit(page_size).all()
-            else:
-                db_students = query_students.order_by(Student.created_at.desc()).all()
-            
-            # Fetch student tags from data node
-            data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-            internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
-            
-            for student in db_students:
-                student_tags = []
-                try:
-                    # Fetch student data from data node to get tags
-                    async with httpx.AsyncClient() as client:
-                        headers = {"Internal-Token": internal_token}
-                        response = await client.get(
-                            f"{data_node_url}/get/student",
-                            params={"student_id": student.student_id},
-                            headers=headers
-                        )
-                        if response.status_code == 200:
-                            student_data = response.json()
-                            student_tags = student_data.get("student_tags", [])
-                except Exception as e:
-                    # If we can't fetch tags, continue with empty list
-                    pass
-                
-                all_users_data.append({
-                    "user_id": student.student_id,
-                    "username": student.username,
-                    "user_type": "student",
-                    "is_active": student.is_active,
-                    "totp_secret": student.totp_secret,
-                    "student_tags": student_tags,
-                    "created_at": student.created_at.isoformat() if student.created_at else None,
-                    "updated_at": student.updated_at.isoformat() if student.updated_at else None,
-                })
-            total += total_students
-        
-        # Get teachers from local auth database
-        if not user_type or user_type == "teacher":
-            query_teachers = db.query(Teacher)
-            if search:
-                query_teachers = query_teachers.filter(Teacher.username.contains(search))
-            total_teachers = query_teachers.count()
-            
-            # Apply pagination only if filtering by teacher type specifically
-            if user_type == "teacher":
-                db_teachers = query_teachers.order_by(Teacher.created_at.desc()).offset((page-1)*page_size).limit(page_size).all()
-            else:
-                db_teachers = query_teachers.order_by(Teacher.created_at.desc()).all()
-            
-            for teacher in db_teachers:
-                all_users_data.append({
-                    "user_id": teacher.teacher_id,
-                    "username": teacher.username,
-                    "user_type": "teacher",
-                    "is_active": teacher.is_active,
-                    "totp_secret": None,  # Teachers don't have 2FA
-                    "created_at": teacher.created_at.isoformat() if teacher.created_at else None,
-                    "updated_at": teacher.updated_at.isoformat() if teacher.updated_at else None,
-                })
-            total += total_teachers
-        
-        # Sort the combined list by created_at in descending order
-        all_users_data.sort(key=lambda x: x['created_at'] or '', reverse=True)
+        listings = [
+            stmt.where(USER_MODELS[listing_type][0].username.contains(search)) if search else stmt
+            for listing_type, stmt in _USER_LISTINGS.items()
+            if not user_type or user_type == listing_type
+        ]
+        if not listings:
+            return {"users": [], "total": 0, "page": page, "page_size": page_size}
+        
+        # Merge the user tables and paginate in SQL, so only one page of rows is loaded.
+        # Users created in the same instant are ordered by type and id, so pages
+        # neither repeat nor skip rows.
+        listing = (listings[0] if len(listings) == 1 else union_all(*listings)).subquery()
+        total = db.execute(select(func.count()).select_from(listing)).scalar_one()
+        rows = db.execute(
+            select(listing)
+            .order_by(listing.c.created_at.desc(), listing.c.user_type, listing.c.user_id.desc())
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ).all()
+        
+        # Fetch the page's student tags from the data node in one call
+        try:
+            tags_by_id = await _fetch_student_tags(
+                client, (row.user_id for row in rows if row.user_type == "student")
+            )
+        except Exception:
+            # If we can't fetch tags, continue with empty lists
+            tags_by_id = {}
         
-        # Apply pagination if we're combining multiple user types
-        if user_type is None:  # Only paginate if getting all types
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            all_users_data = all_users_data[start_index:end_index]
+        all_users_data = []
+        for row in rows:
+            user_data = {
+                "user_id": row.user_id,
+                "username": row.username,
+                "user_type": row.user_type,
+                "is_active": row.is_active,
+                "totp_secret": row.totp_secret,
+            }
+            if row.user_type == "student":
+                user_data["student_tags"] = tags_by_id.get(row.user_id, [])
+            user_data["created_at"] = row.created_at.isoformat() if row.created_at else None
+            user_data["updated_at"] = row.updated_at.isoformat() if row.updated_at else None
+            all_users_data.append(user_data)
         
         return {
             "users": all_users_data,
@@ -163,34 +273,41 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
     @router.get("/admin/user")
     async def get_user_by_username_endpoint(
         username: str,
+        user_type: Optional[str] = None,
         _: None = Depends(verify_admin_or_internal),
         db: Session = Depends(get_db)
     ):
-        """Get user by username (internal only)"""
-        user = get_user_by_username(db, username)
+        """Get user by username (internal only), optionally of one user_type"""
+        if user_type is None:
+            stmt = _USER_BY_USERNAME
+        elif user_type in _USER_BY_USERNAME_OF_TYPE:
+            stmt = _USER_BY_USERNAME_OF_TYPE[user_type]
+        else:
+            raise HTTPException(status_code=400, detail="Invalid user type")
+        # Only the listed columns are selected; no ORM object is loaded
+        user = db.execute(stmt, {"uname": username}).first()
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        # Auth users carry no separate display name or email
         return {
             "user_id": user.user_id,
             "username": user.username,
-            "name": user.name,
+            "name": user.username,
             "user_type": user.user_type,
-            "is_active": user.is_active,
-            "email": user.email
+            "is_active": bool(user.is_active),
+            "email": None
         }
     
     
-    @router.post("/admin/user/add")
+    @router.post("/admin/user/add", status_code=status.HTTP_201_CREATED)
     async def add_user_endpoint(
         user_data: dict,
         current_admin: Admin = Depends(get_current_admin),
+        outbox: DataNodeOutbox = Depends(get_data_node_outbox),
         db: Session = Depends(get_db)
     ):
         """Add new user (admin only)"""
-        import secrets
-        import string
-        
         username = user_data.get("username")
         password = user_data.get("password")
         user_type = user_data.get("user_type")
@@ -200,29 +317,20 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
         
         # Generate password if not provided
         if not password:
-            alphabet = string.ascii_letters + string.digits
-            password = ''.join(secrets.choice(alphabet) for _ in range(12))
+            password = _generate_password(GENERATED_PASSWORD_ALPHABET)
         
         # Check if user exists in the appropriate table
         if user_type == "admin":
-            existing = db.query(Admin).filter(Admin.username == username).first()
-            if existing:
+            # Insert unless the username is taken, atomically in one statement
+            if create_admin(db, username, get_password_hash(password)) is None:
                 raise HTTPException(status_code=400, detail="Admin already exists")
-            
-            # Create admin
-            new_admin = Admin(
-                username=username,
-                password_hash=get_password_hash(password)
-            )
-            db.add(new_admin)
         else:
-            # Check both student and teacher tables
-            existing_student = db.query(Student).filter(Student.username == username).first()
-            existing_teacher = db.query(Teacher).filter(Teacher.username == username).first()
-            if existing_student or existing_teacher:
+            # Check both student and teacher tables in one query
+            if db.execute(_STUDENT_OR_TEACHER_USERNAME, {"uname": username}).first():
                 raise HTTPException(status_code=400, detail="User already exists")
             
-            # Create user in the appropriate auth table and also provision course data in data-node
+            # Create user in the appropriate auth table and queue its course data record
+            # for the data node in the same transaction; the outbox delivers it after commit
             if user_type == "student":
                 # Create student in auth DB
                 new_student = Student(
@@ -233,31 +341,14 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
                     is_active=True,
                 )
                 db.add(new_student)
-                db.commit()
-                db.refresh(new_student)
-    
-                # Create corresponding student record in data-node
-                data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-                internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
+                db.flush()  # Assigns student_id
     
-                student_payload = {
+                # Queue the corresponding student record for the data node
+                outbox.add(db, "/add/student", {
                     "student_id": new_student.student_id,  # Sync student_id from auth to course data
                     "student_name": username,
                     "student_tags": []
-                }
-                headers = {"Internal-Token": internal_token}
-                try:
-                    async with httpx.AsyncClient() as client:
-                        response = await client.post(f"{data_node_url}/add/student", json=student_payload, headers=headers)
-                    if response.status_code != status.HTTP_201_CREATED:
-                        # Rollback auth record if course data creation fails
-                        db.delete(new_student)
-                        db.commit()
-                        raise HTTPException(status_code=500, detail=f"Failed to create student course data: {response.text}")
-                except httpx.HTTPError as e:
-                    db.delete(new_student)
-                    db.commit()
-                    raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
+                })
     
             elif user_type == "teacher":
                 # Create teacher in auth DB
@@ -267,34 +358,19 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
                     is_active=True,
                 )
                 db.add(new_teacher)
-                db.commit()
-                db.refresh(new_teacher)
-    
-                # Create corresponding teacher record in data-node
-                data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-                internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
+                db.flush()  # Assigns teacher_id
     
-                teacher_payload = {
+                # Queue the corresponding teacher record for the data node
+                outbox.add(db, "/add/teacher", {
                     "teacher_id": new_teacher.teacher_id,  # Sync teacher_id from auth to course data
                     "teacher_name": username,
-                }
-                headers = {"Internal-Token": internal_token}
-                try:
-                    async with httpx.AsyncClient() as client:
-                        response = await client.post(f"{data_node_url}/add/teacher", json=teacher_payload, headers=headers)
-                    if response.status_code != status.HTTP_201_CREATED:
-                        # Rollback auth record if course data creation fails
-                        db.delete(new_teacher)
-                        db.commit()
-                        raise HTTPException(status_code=500, detail=f"Failed to create teacher course data: {response.text}")
-                except httpx.HTTPError as e:
-                    db.delete(new_teacher)
-                    db.commit()
-                    raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
+                })
             else:
                 raise HTTPException(status_code=400, detail="Invalid user type")
         
         db.commit()
+        invalidate_username(username)
+        outbox.wake()
         
         return {
             "success": True,
@@ -318,25 +394,19 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
         if not user_id or not user_type:
             raise HTTPException(status_code=400, detail="user_id and user_type required")
         
-        if user_type == "admin":
-            admin = db.query(Admin).filter(Admin.admin_id == user_id).first()
-            if not admin:
-                raise HTTPException(status_code=404, detail="Admin not found")
-            db.delete(admin)
-        elif user_type == "student":
-            student = db.query(Student).filter(Student.student_id == user_id).first()
-            if not student:
-                raise HTTPException(status_code=404, detail="Student not found")
-            db.delete(student)
-        elif user_type == "teacher":
-            teacher = db.query(Teacher).filter(Teacher.teacher_id == user_id).first()
-            if not teacher:
-                raise HTTPException(status_code=404, detail="Teacher not found")
-            db.delete(teacher)
-        else:
+        if user_type not in USER_MODELS:
             raise HTTPException(status_code=400, detail="Invalid user type")
         
+        model, id_column = USER_MODELS[user_type]
+        user = db.query(model).filter(id_column == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail=f"{user_type.capitalize()} not found")
+        db.delete(user)
+        
         db.commit()
+        invalidate_username(user.username)
+        if user_type == "admin":
+            invalidate_admin(user_id)
         return {"success": True, "message": "User deleted successfully"}
     
     
@@ -381,46 +451,29 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
             raise HTTPException(status_code=400, detail="user_id and is_active required")
         
         # If caller specifies user_type, use it directly to avoid cross-table ID collisions
-        if user_type == "student":
-            student = db.query(Student).filter(Student.student_id == user_id).first()
-            if not student:
-                raise HTTPException(status_code=404, detail="Student not found")
-            student.is_active = is_active
-            db.commit()
-            return {"success": True, "message": f"Student {'activated' if is_active else 'deactivated'} successfully"}
-        elif user_type == "teacher":
-            teacher = db.query(Teacher).filter(Teacher.teacher_id == user_id).first()
-            if not teacher:
-                raise HTTPException(status_code=404, detail="Teacher not found")
-            teacher.is_active = is_active
-            db.commit()
-            return {"success": True, "message": f"Teacher {'activated' if is_active else 'deactivated'} successfully"}
-        elif user_type == "admin":
-            admin = db.query(Admin).filter(Admin.admin_id == user_id).first()
-            if not admin:
-                raise HTTPException(status_code=404, detail="Admin not found")
-            # Admin model may not have is_active; treat toggle as unsupported for admins
-            raise HTTPException(status_code=400, detail="Toggling admin status is not supported")
+        if user_type in USER_MODELS:
+            not_found = f"{user_type.capitalize()} not found"
+        else:
+            # Fallback: find the owning table with one query (may be ambiguous if IDs overlap)
+            user_type = db.execute(_USER_OWNER, {"uid": user_id}).scalar()
+            not_found = "User not found"
+            if user_type is None:
+                raise HTTPException(status_code=404, detail=not_found)
         
-        # Fallback: detect by probing tables in order (may be ambiguous if IDs overlap)
-        student = db.query(Student).filter(Student.student_id == user_id).first()
-        if student:
-            student.is_active = is_active
-            db.commit()
-            return {"success": True, "message": f"Student {'activated' if is_active else 'deactivated'} successfully"}
-        
-        teacher = db.query(Teacher).filter(Teacher.teacher_id == user_id).first()
-        if teacher:
-            teacher.is_active = is_active
-            db.commit()
-            return {"success": True, "message": f"Teacher {'activated' if is_active else 'deactivated'} successfully"}
-        
-        admin = db.query(Admin).filter(Admin.admin_id == user_id).first()
-        if admin:
-            # Admin model may not have is_active; return a clear error
+        # Admin model has no is_active; treat toggle as unsupported for admins
+        if user_type == "admin":
+            if not get_user_by_id(db, user_id, user_type):
+                raise HTTPException(status_code=404, detail=not_found)
             raise HTTPException(status_code=400, detail="Toggling admin status is not supported")
         
-        raise HTTPException(status_code=404, detail="User not found")
+        if db.execute(_SET_ACTIVE[user_type], {"uid": user_id, "active": is_active}).first() is None:
+            raise HTTPException(status_code=404, detail=not_found)
+        db.commit()
+        
+        return {
+            "success": True,
+            "message": f"{user_type.capitalize()} {'activated' if is_active else 'deactivated'} successfully",
+        }
     
     
     @router.post("/admin/user/reset-password")
@@ -430,9 +483,6 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
         db: Session = Depends(get_db)
     ):
         """Reset user password (admin only) - can set custom password or generate random one"""
-        import secrets
-        import string
-        
         username = data.get("username")
         user_type = data.get("user_type")
         custom_password = data.get("new_password")  # Optional custom password
@@ -447,30 +497,19 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
             new_password = custom_password
         else:
             # Generate a secure random password (12 characters)
-            alphabet = string.ascii_letters + string.digits + "!@#$%&*"
-            new_password = ''.join(secrets.choice(alphabet) for _ in range(12))
+            new_password = _generate_password(RESET_PASSWORD_ALPHABET)
         
         new_password_hash = get_password_hash(new_password)
         
         # Update password in the appropriate table
-        if user_type == "student":
-            user = db.query(Student).filter(Student.username == username).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="Student not found")
-            user.password_hash = new_password_hash
-        elif user_type == "teacher":
-            user = db.query(Teacher).filter(Teacher.username == username).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="Teacher not found")
-            user.password_hash = new_password_hash
-        elif user_type == "admin":
-            user = db.query(Admin).filter(Admin.username == username).first()
-            if not user:
-                raise HTTPException(status_code=404, detail="Admin not found")
-            user.password_hash = new_password_hash
-        else:
+        if user_type not in USER_MODELS:
             raise HTTPException(status_code=400, detail="Invalid user type")
         
+        updated = db.execute(
+            _RESET_PASSWORD[user_type], {"uname": username, "new_hash": new_password_hash}
+        ).first()
+        if updated is None:
+            raise HTTPException(status_code=404, detail=f"{user_type.capitalize()} not found")
         db.commit()
         
         return {
@@ -485,6 +524,7 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
     async def update_student_tags_endpoint(
         data: dict,
         current_admin: Admin = Depends(get_current_admin),
+        client: httpx.AsyncClient = Depends(get_http_client),
         db: Session = Depends(get_db)
     ):
         """Update student tags (admin only)"""
@@ -500,25 +540,22 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
             raise HTTPException(status_code=404, detail="Student not found")
         
         # Update student tags in data node
-        data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-        internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
-        
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {"Internal-Token": internal_token}
-                # data_node expects student_id and student_tags as query params;
-                # student_tags is a List[str] query param (repeated keys)
-                params = {"student_id": student_id, "student_tags": student_tags}
-                response = await client.post(
-                    f"{data_node_url}/update/student",
-                    params=params,
-                    headers=headers
-                )
-                if response.status_code != 200:
-                    raise HTTPException(status_code=500, detail=f"Failed to update student tags: {response.text}")
+            # data_node expects student_id and student_tags as query params;
+            # student_tags is a List[str] query param (repeated keys)
+            params = {"student_id": student_id, "student_tags": student_tags}
+            response = await client.post(
+                "/update/student",
+                params=params
+            )
+            if response.status_code != 200:
+                raise HTTPException(status_code=500, detail=f"Failed to update student tags: {response.text}")
         except httpx.HTTPError as e:
             raise HTTPException(status_code=500, detail=f"Error contacting data node: {str(e)}")
         
+        # New tags become available tags on the data node
+        _invalidate_available_tags()
+        
         return {"success": True, "message": "Student tags updated successfully"}
     
     
@@ -526,6 +563,7 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
     async def batch_import_user_tags(
         data: dict,
         current_admin: Admin = Depends(get_current_admin),
+        client: httpx.AsyncClient = Depends(get_http_client),
         db: Session = Depends(get_db)
     ):
         """
@@ -542,17 +580,16 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
             "total": 0
         }
         
-        data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-        internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
-        
         # Parse CSV
-        lines = csv_text.strip().split('\n')
-        for line_num, line in enumerate(lines, 1):
-            if not line.strip():
+        parsed = []  # (line_num, username, tags)
+        reader = csv.reader(io.StringIO(csv_text.strip()))
+        for line_num, parts in enumerate(reader, 1):
+            # Skip blank lines
+            if not parts or (len(parts) == 1 and not parts[0].strip()):
                 continue
                 
             results["total"] += 1
-            parts = [p.strip() for p in line.split(',')]
+            parts = [p.strip() for p in parts]
             
             if len(parts) < 2:
                 results["failed"].append({
@@ -561,70 +598,95 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
                 })
                 continue
             
-            username = parts[0]
-            tags = [tag for tag in parts[1:] if tag]
-            
-            # Find student by username
-            student = db.query(Student).filter(Student.username == username).first()
-            if not student:
+            parsed.append((line_num, parts[0], [tag for tag in parts[1:] if tag]))
+        
+        # Find all the students by username in one query
+        student_ids = dict(db.execute(
+            select(Student.username, Student.student_id)
+            .where(Student.username.in_({username for _, username, _ in parsed}))
+        ).all())
+        
+        pending = []  # (line_num, username, student_id, tags)
+        for line_num, username, tags in parsed:
+            if username not in student_ids:
                 results["failed"].append({
                     "line": line_num,
                     "username": username,
                     "error": "Student not found"
                 })
                 continue
-            
-            # Get current tags for the student
-            try:
-                async with httpx.AsyncClient() as client:
-                    headers = {"Internal-Token": internal_token}
-                    # Get student details to retrieve current tags
-                    response = await client.get(
-                        f"{data_node_url}/get/student",
-                        params={"student_id": student.student_id},
-                        headers=headers
-                    )
-                    
-                    if response.status_code == 200:
-                        student_data = response.json()
-                        existing_tags = student_data.get("student_tags", [])
-                    else:
-                        existing_tags = []
-                    
-                    # Merge tags (avoid duplicates)
-                    updated_tags = list(set(existing_tags + tags))
-                    
-                    # Update student tags
-                    params = {"student_id": student.student_id, "student_tags": updated_tags}
-                    response = await client.post(
-                        f"{data_node_url}/update/student",
-                        params=params,
-                        headers=headers
-                    )
-                    
-                    if response.status_code == 200:
-                        results["success"].append({
-                            "username": username,
-                            "tags_added": tags,
-                            "total_tags": len(updated_tags)
-                        })
-                    else:
-                        results["failed"].append({
-                            "line": line_num,
-                            "username": username,
-                            "error": f"Failed to update: {response.text}"
-                        })
-            except httpx.HTTPError as e:
+            pending.append((line_num, username, student_ids[username], tags))
+        
+        # Get current tags for all of these students in one data node call
+        try:
+            current_tags = await _fetch_student_tags(client, {student_id for _, _, student_id, _ in pending})
+        except httpx.HTTPError as e:
+            for line_num, username, _, _ in pending:
                 results["failed"].append({
                     "line": line_num,
                     "username": username,
                     "error": f"HTTP error: {str(e)}"
                 })
-            except Exception as e:
+            pending = []
+        
+        # Merge tags (avoid duplicates). Lines for the same student accumulate,
+        # so each student needs a single update with its final tag set. Dict
+        # keys keep the existing tags first and new ones in the order given,
+        # so re-importing does not reshuffle a student's tags.
+        merged_tags = {}  # student_id -> {tag: None}, in tag order
+        line_tag_totals = []
+        for _, _, student_id, tags in pending:
+            student_tags = merged_tags.get(student_id)
+            if student_tags is None:
+                student_tags = merged_tags[student_id] = dict.fromkeys(
+                    tag for tag in current_tags.get(student_id, []) if tag
+                )
+            student_tags.update(dict.fromkeys(tags))
+            line_tag_totals.append(len(student_tags))
+        
+        # Update the students concurrently, with a bounded number in flight
+        semaphore = asyncio.Semaphore(TAG_UPDATE_CONCURRENCY)
+        
+        async def update_student_tags(student_id: int, tags: List[str]) -> httpx.Response:
+            async with semaphore:
+                return await client.post(
+                    "/update/student",
+                    params={"student_id": student_id, "student_tags": tags}
+                )
+        
+        responses = await asyncio.gather(
+            *(update_student_tags(student_id, list(tags)) for student_id, tags in merged_tags.items()),
+            return_exceptions=True
+        )
+        update_results = dict(zip(merged_tags, responses))
+        if merged_tags:
+            _invalidate_available_tags()
+        
+        for (line_num, username, student_id, tags), total_tags in zip(pending, line_tag_totals):
+            response = update_results[student_id]
+            if isinstance(response, httpx.HTTPError):
+                results["failed"].append({
+                    "line": line_num,
+                    "username": username,
+                    "error": f"HTTP error: {str(response)}"
+                })
+            elif isinstance(response, Exception):
                 results["failed"].append({
                     "line": line_num,
                     "username": username,
-                    "error": str(e)
+                    "error": str(response)
+                })
+            elif response.status_code == 200:
+                results["success"].append({
+                    "username": username,
+                    "tags_added": tags,
+                    "total_tags": total_tags
+                })
+            else:
+                results["failed"].append({
+                    "line": line_num,
+                    "username": username,
+                    "error": f"Failed to update: {response.text}"
                 })
         
         return {
@@ -638,38 +700,49 @@ def create_user_management_router(get_db: Callable, verify_admin_or_internal: Ca
     
     @router.get("/admin/tags/available")
     async def get_available_tags_admin(
+        response: Response,
         tag_type: Optional[str] = None,
-        current_admin: Admin = Depends(get_current_admin)
+        current_admin: Admin = Depends(get_current_admin),
+        client: httpx.AsyncClient = Depends(get_http_client)
     ):
         """Get available tags for autocomplete (admin only)"""
-        data_node_url = os.getenv("DATA_NODE_URL", "http://localhost:8001")
-        internal_token = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
         
-        try:
-            async with httpx.AsyncClient() as client:
-                headers = {"Internal-Token": internal_token}
+        async def fetch_available_tags() -> dict:
+            try:
                 params = {}
                 if tag_type:
                     params["tag_type"] = tag_type
                 
-                response = await client.get(
-                    f"{data_node_url}/tags/available",
-                    params=params,
-                    headers=headers
+                data_node_response = await client.get(
+                    "/tags/available",
+                    params=params
                 )
                 
-                if response.status_code != 200:
+                if data_node_response.status_code != 200:
                     raise HTTPException(
                         status_code=500, 
-                        detail=f"Failed to get available tags: {response.text}"
+                        detail=f"Failed to get available tags: {data_node_response.text}"
                     )
                 
-                return response.json()
-        except httpx.HTTPError as e:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error contacting data node: {str(e)}"
-            )
+                return data_node_response.json()
+            except httpx.HTTPError as e:
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Error contacting data node: {str(e)}"
+                )
+        
+        # Autocomplete fires on every keystroke; serve repeats from memory
+        # and let concurrent misses share one data node call
+        key = tag_type or ""
+        tags = available_tags_cache.get(key)
+        if tags is None:
+            generation = _available_tags_generation
+            tags = await available_tags_lookups.do((generation, key), fetch_available_tags)
+            if generation == _available_tags_generation:
+                available_tags_cache.set(key, tags)
+        
+        response.headers["Cache-Control"] = f"private, max-age={AVAILABLE_TAGS_TTL}"
+        return tags
     
     
     # ===== Refresh Token Endpoint =====
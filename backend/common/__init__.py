@@ -1,204 +1,164 @@
-"""Common package initialization"""
-from .models import (
-    DataBase,
-    AuthBase,
-    QueueBase,
-    Course,
-    StudentCourseData,
-    TeacherCourseData,
-    AvailableTag,
-    Student,
-    Teacher,
-    Admin,
-    RefreshToken,
-    RegistrationCode,
-    ResetCode,
-    SystemSettings,
-    QueueTask,
-)
-from .schemas import (
-    CourseCreate,
-    CourseUpdate,
-    CourseResponse,
-    CourseSelectionRequest,
-    CourseSelectionData,
-    StudentCreate,
-    StudentResponse,
-    TeacherCreate,
-    TeacherResponse,
-    UserCreate,
-    UserLogin,
-    User2FA,
-    UserResponse,
-    AdminResponse,
-    TokenResponse,
-    RefreshTokenResponse,
-    AccessTokenResponse,
-    QueueTaskResponse,
-    RegistrationCodeCreate,
-    RegistrationCodeResponse,
-    BulkRegistrationCodeResponse,
-    ResetCodeCreate,
-    ResetCodeResponse,
-    AdminLogin,
-    QueueTaskSubmit,
-    QueueTaskStatus,
-    AdminCreate,
-    SystemSettingsResponse,
-    SystemSettingsUpdate,
-    PasswordChangeRequest,
-    TwoFASetupRequest,
-    TwoFAVerifyRequest,
-    TwoFADisableRequest,
-)
-from .security import (
-    verify_password,
-    get_password_hash,
-    create_access_token,
-    create_refresh_token,
-    decode_token,
-    generate_totp_secret,
-    verify_totp,
-    get_totp_uri,
-    generate_registration_code,
-    generate_reset_code,
-    hash_token,
-    generate_internal_token,
-)
-from .database import (
-    get_database_url,
-    create_db_engine,
-    create_session_factory,
-    get_db_session,
-    init_database,
-)
-from .rate_limiter import (
-    TokenBucket,
-    RateLimiter,
-    IPRateLimiter,
-    course_selection_limiter,
-    api_limiter,
-)
-from .utils import (
-    verify_internal_token,
-    get_current_user_from_token,
-    verify_user_type,
-    get_request_headers,
-    call_service_api,
-)
-from .auth_helpers import (
-    get_user_by_username,
-    get_user_by_id,
-    get_user_id,
-    get_user_type,
-    has_2fa,
-    get_totp_secret,
-    set_totp_secret,
-    is_active,
-)
-from .socket_transport import (
-    SocketTransport,
-    SocketClient,
-    get_socket_config,
-    create_socket_server_config,
-    create_dual_server_config,
-)
+"""Common package initialization
 
-__all__ = [
-    # Models and Bases
-    "DataBase",
-    "AuthBase",
-    "QueueBase",
-    "Course",
-    "StudentCourseData",
-    "TeacherCourseData",
-    "AvailableTag",
-    "Student",
-    "Teacher",
-    "Admin",
-    "RefreshToken",
-    "RegistrationCode",
-    "ResetCode",
-    "SystemSettings",
-    "QueueTask",
-    # Schemas
-    "CourseCreate",
-    "CourseUpdate",
-    "CourseResponse",
-    "CourseSelectionRequest",
-    "CourseSelectionData",
-    "StudentCreate",
-    "StudentResponse",
-    "TeacherCreate",
-    "TeacherResponse",
-    "UserCreate",
-    "UserLogin",
-    "User2FA",
-    "UserResponse",
-    "AdminResponse",
-    "TokenResponse",
-    "RefreshTokenResponse",
-    "AccessTokenResponse",
-    "RegistrationCodeCreate",
-    "RegistrationCodeResponse",
-    "BulkRegistrationCodeResponse",
-    "ResetCodeCreate",
-    "ResetCodeResponse",
-    "QueueTaskResponse",
-    "AdminLogin",
-    "QueueTaskSubmit",
-    "QueueTaskStatus",
-    "AdminCreate",
-    "SystemSettingsResponse",
-    "SystemSettingsUpdate",
-    "PasswordChangeRequest",
-    "TwoFASetupRequest",
-    "TwoFAVerifyRequest",
-    "TwoFADisableRequest",
-    # Security
-    "verify_password",
-    "get_password_hash",
-    "create_access_token",
-    "create_refresh_token",
-    "decode_token",
-    "generate_totp_secret",
-    "verify_totp",
-    "get_totp_uri",
-    "generate_registration_code",
-    "generate_reset_code",
-    "hash_token",
-    "generate_internal_token",
-    # Database
-    "get_database_url",
-    "create_db_engine",
-    "create_session_factory",
-    "get_db_session",
-    "init_database",
-    # Rate limiting
-    "TokenBucket",
-    "RateLimiter",
-    "IPRateLimiter",
-    "course_selection_limiter",
-    "api_limiter",
-    # Utils
-    "verify_internal_token",
-    "get_current_user_from_token",
-    "verify_user_type",
-    "get_request_headers",
-    "call_service_api",
-    # Auth helpers
-    "get_user_by_username",
-    "get_user_by_id",
-    "get_user_id",
-    "get_user_type",
-    "has_2fa",
-    "get_totp_secret",
-    "set_totp_secret",
-    "is_active",
-    # Socket transport
-    "SocketTransport",
-    "SocketClient",
-    "get_socket_config",
-    "create_socket_server_config",
-    "create_dual_server_config",
-]
+Names are re-exported lazily: a submodule is only imported the first time
+one of its names is used, so tools that need a little of the package (like
+the CLI) don't pay for importing FastAPI, SQLAlchemy and the KDFs.
+"""
+from importlib import import_module
+
+# submodule -> names it provides
+_EXPORTS = {
+    ".models": (
+        "DataBase",
+        "AuthBase",
+        "QueueBase",
+        "Course",
+        "StudentCourseData",
+        "TeacherCourseData",
+        "AvailableTag",
+        "Student",
+        "Teacher",
+        "Admin",
+        "RefreshToken",
+        "PendingDataNodeOp",
+        "RegistrationCode",
+        "ResetCode",
+        "SystemSettings",
+        "QueueTask",
+    ),
+    ".schemas": (
+        "CourseCreate",
+        "CourseUpdate",
+        "CourseResponse",
+        "CourseSelectionRequest",
+        "CourseSelectionData",
+        "StudentCreate",
+        "StudentResponse",
+        "TeacherCreate",
+        "TeacherResponse",
+        "UserCreate",
+        "UserLogin",
+        "User2FA",
+        "TOTPSetup",
+        "UserResponse",
+        "AdminResponse",
+        "TokenResponse",
+        "RefreshTokenResponse",
+        "AccessTokenResponse",
+        "QueueTaskResponse",
+        "RegistrationCodeCreate",
+        "RegistrationCodeResponse",
+        "BulkRegistrationCodeResponse",
+        "ResetCodeCreate",
+        "ResetCodeResponse",
+        "AdminLogin",
+        "QueueTaskSubmit",
+        "QueueTaskStatus",
+        "AdminCreate",
+        "SystemSettingsResponse",
+        "SystemSettingsUpdate",
+        "PasswordChangeRequest",
+        "TwoFASetupRequest",
+        "TwoFAVerifyRequest",
+        "TwoFADisableRequest",
+    ),
+    ".security": (
+        "verify_password",
+        "get_password_hash",
+        "verify_password_async",
+        "get_password_hash_async",
+        "create_access_token",
+        "create_refresh_token",
+        "decode_token",
+        "generate_totp_secret",
+        "verify_totp",
+        "get_totp_uri",
+        "generate_registration_code",
+        "generate_reset_code",
+        "hash_token",
+        "generate_internal_token",
+    ),
+    ".database": (
+        "get_database_url",
+        "create_db_engine",
+        "create_session_factory",
+        "get_db_session",
+        "init_database",
+        "existing_values",
+    ),
+    ".rate_limiter": (
+        "TokenBucket",
+        "RateLimiter",
+        "IPRateLimiter",
+        "course_selection_limiter",
+        "api_limiter",
+    ),
+    ".utils": (
+        "verify_internal_token",
+        "strip_bearer",
+        "decode_access_token",
+        "get_current_user_from_token",
+        "verify_user_type",
+        "get_request_headers",
+        "get_client_ip",
+        "call_service_api",
+        "get_service_client",
+        "close_service_client",
+        "SERVICE_LIMITS",
+        "SERVICE_TIMEOUT",
+    ),
+    ".auth_helpers": (
+        "get_user_by_username",
+        "get_user_by_id",
+        "invalidate_username",
+        "get_admin",
+        "invalidate_admin",
+        "get_2fa_status_columns",
+        "get_user_id",
+        "get_user_type",
+        "has_2fa",
+        "get_totp_secret",
+        "set_totp_secret",
+        "is_active",
+    ),
+    ".cache": (
+        "TTLCache",
+        "SingleFlight",
+    ),
+    ".responses": (
+        "ORJSONResponse",
+    ),
+    ".middleware": (
+        "JWTMiddleware",
+    ),
+    ".circuit_breaker": (
+        "CircuitBreaker",
+        "CircuitOpenError",
+        "retry_async",
+        "RETRY_SAFE_ERRORS",
+    ),
+    ".socket_transport": (
+        "SocketTransport",
+        "SocketClient",
+        "get_socket_config",
+        "create_socket_server_config",
+        "create_dual_server_config",
+    ),
+}
+
+_SOURCES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = [name for names in _EXPORTS.values() for name in names]
+
+
+def __getattr__(name):
+    module = _SOURCES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,8 +1,111 @@
 """Authentication helper functions for querying correct user tables"""
+from operator import attrgetter
+from sqlalchemy import bindparam, false, literal, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
+from .cache import TTLCache
 from .models import Student, Teacher, Admin
 
+# user_type -> (model, primary key column)
+USER_MODELS = {
+    "student": (Student, Student.student_id),
+    "teacher": (Teacher, Teacher.teacher_id),
+    "admin": (Admin, Admin.admin_id),
+}
+
+# Per-object dispatch on the exact model class: one dict lookup instead of an
+# isinstance ladder. Only students and teachers have 2FA columns.
+_USER_TYPES = {model: user_type for user_type, (model, _) in USER_MODELS.items()}
+_ID_GETTERS = {model: attrgetter(id_column.key) for model, id_column in USER_MODELS.values()}
+_2FA_MODELS = frozenset((Student, Teacher))
+# Models with an is_active column (admins have none and are always active),
+# decided once per class instead of with hasattr() on every call
+_ACTIVE_FLAG_MODELS = frozenset(model for model, _ in USER_MODELS.values() if hasattr(model, "is_active"))
+
+# Primary key lookups per user type, built once so the compiled form is
+# reused from the engine's query cache on every call
+_LOADERS = {
+    user_type: select(model).where(id_column == bindparam("id"))
+    for user_type, (model, id_column) in USER_MODELS.items()
+}
+
+# Username lookups per user type
+_USERNAME_LOADERS = {
+    user_type: select(model).where(model.username == bindparam("uname"))
+    for user_type, (model, _) in USER_MODELS.items()
+}
+
+# Which table holds a username, searched in one round trip. Admins, then
+# students, then teachers win when a username exists in more than one table.
+_USERNAME_PRIORITY = ("admin", "student", "teacher")
+_username_candidates = union_all(*(
+    select(
+        literal(user_type).label("user_type"),
+        USER_MODELS[user_type][1].label("user_id"),
+        literal(priority).label("priority"),
+    ).where(USER_MODELS[user_type][0].username == bindparam("uname"))
+    for priority, user_type in enumerate(_USERNAME_PRIORITY)
+)).subquery()
+_USERNAME_OWNER = (
+    select(_username_candidates.c.user_type, _username_candidates.c.user_id)
+    .order_by(_username_candidates.c.priority)
+    .limit(1)
+)
+
+# username -> (user_type, user_id) resolved by _USERNAME_OWNER. Rows are still
+# loaded fresh by primary key; only the "which table" probe is skipped. Only
+# hits are cached, so new users are found at once.
+_username_owners = TTLCache(maxsize=10_000, ttl=30.0)
+
+# admin_id -> Admin row detached from its session, so admin-authenticated
+# requests skip the query. The admin table is tiny; a miss still queries, so
+# new admins are found at once.
+_admins = TTLCache(maxsize=1024, ttl=60.0)
+
+# (has_2fa, username) lookups per user type; admins have no 2FA column
+_2FA_STATUS_LOADERS = {
+    "student": select(Student.has_2fa, Student.username).where(Student.student_id == bindparam("id")),
+    "teacher": select(Teacher.has_2fa, Teacher.username).where(Teacher.teacher_id == bindparam("id")),
+    "admin": select(false(), Admin.username).where(Admin.admin_id == bindparam("id")),
+}
+
+# INSERT ... ON CONFLICT support for the databases the services run on
+_CONFLICT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def create_admin(db: Session, username: str, password_hash: str) -> Optional[int]:
+    """Insert an admin unless the username is taken, in one statement.
+
+    Args:
+        db: Database session (auth database)
+        username: Admin username
+        password_hash: Hashed password
+
+    Returns:
+        The new admin_id, or None if an admin with that username already exists
+    """
+    invalidate_username(username)
+    conflict_insert = _CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+    if conflict_insert is None:
+        # No ON CONFLICT in this dialect: check first
+        if db.execute(select(Admin.admin_id).where(Admin.username == username)).first():
+            return None
+        admin = Admin(username=username, password_hash=password_hash)
+        db.add(admin)
+        db.flush()
+        return admin.admin_id
+    stmt = (
+        conflict_insert(Admin)
+        .values(username=username, password_hash=password_hash)
+        .on_conflict_do_nothing(index_elements=[Admin.username])
+        .returning(Admin.admin_id)
+    )
+    return db.execute(stmt).scalar()
+
 
 def get_user_by_username(db: Session, username: str, user_type: Optional[str] = None) -> Optional[Union[Student, Teacher, Admin]]:
     """Get user by username from appropriate table in auth database.
@@ -15,25 +118,35 @@ def get_user_by_username(db: Session, username: str, user_type: Optional[str] =
     Returns:
         User object (Student, Teacher, or Admin) or None
     """
-    # Check admin table
-    if user_type == "admin" or user_type is None:
-        admin = db.query(Admin).filter(Admin.username == username).first()
-        if admin:
-            return admin
-
-    # Check student table
-    if user_type == "student" or user_type is None:
-        student = db.query(Student).filter(Student.username == username).first()
-        if student:
-            return student
-
-    # Check teacher table
-    if user_type == "teacher" or user_type is None:
-        teacher = db.query(Teacher).filter(Teacher.username == username).first()
-        if teacher:
-            return teacher
+    if user_type is not None:
+        stmt = _USERNAME_LOADERS.get(user_type)
+        if stmt is None:
+            return None
+        return db.execute(stmt, {"uname": username}).scalars().first()
 
-    return None
+    owner = _username_owners.get(username)
+    if owner is not None:
+        user = get_user_by_id(db, owner[1], owner[0])
+        if user is not None and user.username == username:
+            return user
+        # Deleted or renamed since it was cached
+        _username_owners.pop(username)
+
+    # Find the owning table for all three in one query, then load that row
+    owner = db.execute(_USERNAME_OWNER, {"uname": username}).first()
+    if owner is None:
+        return None
+    _username_owners.set(username, (owner.user_type, owner.user_id))
+    return get_user_by_id(db, owner.user_id, owner.user_type)
+
+
+def invalidate_username(username: str) -> None:
+    """Forget the cached table lookup for username.
+
+    Call after creating or deleting a user, since that can change which
+    table get_user_by_username resolves the name to.
+    """
+    _username_owners.pop(username)
 
 
 def get_user_by_id(db: Session, user_id: int, user_type: str) -> Optional[Union[Student, Teacher, Admin]]:
@@ -47,14 +160,57 @@ def get_user_by_id(db: Session, user_id: int, user_type: str) -> Optional[Union[
     Returns:
         User object (Student, Teacher, or Admin) or None
     """
-    if user_type == "admin":
-        return db.query(Admin).filter(Admin.admin_id == user_id).first()
-    elif user_type == "student":
-        return db.query(Student).filter(Student.student_id == user_id).first()
-    elif user_type == "teacher":
-        return db.query(Teacher).filter(Teacher.teacher_id == user_id).first()
+    stmt = _LOADERS.get(user_type)
+    if stmt is None:
+        return None
+    return db.execute(stmt, {"id": user_id}).scalar_one_or_none()
 
-    return None
+
+def get_admin(db: Session, admin_id: int) -> Optional[Admin]:
+    """Get an admin by ID, from a short-lived cache when possible.
+
+    The row is detached from any session: read its columns, don't modify it.
+
+    Args:
+        db: Database session (auth database)
+        admin_id: Admin ID to search for
+
+    Returns:
+        Admin object or None
+    """
+    admin = _admins.get(admin_id)
+    if admin is None:
+        admin = get_user_by_id(db, admin_id, "admin")
+        if admin is None:
+            return None
+        db.expunge(admin)
+        _admins.set(admin_id, admin)
+    return admin
+
+
+def invalidate_admin(admin_id: int) -> None:
+    """Forget the cached row of an admin (call after deleting or changing it)"""
+    _admins.pop(admin_id)
+
+
+def get_2fa_status_columns(db: Session, user_id: int, user_type: str) -> Optional[Tuple[bool, str]]:
+    """Get just the 2FA flag and username of a user, without loading the full row.
+
+    Args:
+        db: Database session (auth database)
+        user_id: User ID to search for
+        user_type: User type ("student", "teacher", "admin")
+
+    Returns:
+        (has_2fa, username) or None if the user does not exist
+    """
+    stmt = _2FA_STATUS_LOADERS.get(user_type)
+    if stmt is None:
+        return None
+    row = db.execute(stmt, {"id": user_id}).one_or_none()
+    if row is None:
+        return None
+    return bool(row[0]), row[1]
 
 
 def get_user_id(user: Union[Student, Teacher, Admin]) -> int:
@@ -66,13 +222,10 @@ def get_user_id(user: Union[Student, Teacher, Admin]) -> int:
     Returns:
         User ID
     """
-    if isinstance(user, Student):
-        return user.student_id
-    elif isinstance(user, Teacher):
-        return user.teacher_id
-    elif isinstance(user, Admin):
-        return user.admin_id
-    raise ValueError("Invalid user type")
+    getter = _ID_GETTERS.get(type(user))
+    if getter is None:
+        raise ValueError("Invalid user type")
+    return getter(user)
 
 
 def get_user_type(user: Union[Student, Teacher, Admin]) -> str:
@@ -84,13 +237,10 @@ def get_user_type(user: Union[Student, Teacher, Admin]) -> str:
     Returns:
         User type string ("student", "teacher", or "admin")
     """
-    if isinstance(user, Student):
-        return "student"
-    elif isinstance(user, Teacher):
-        return "teacher"
-    elif isinstance(user, Admin):
-        return "admin"
-    raise ValueError("Invalid user type")
+    user_type = _USER_TYPES.get(type(user))
+    if user_type is None:
+        raise ValueError("Invalid user type")
+    return user_type
 
 
 def has_2fa(user: Union[Student, Teacher, Admin]) -> bool:
@@ -102,12 +252,8 @@ def has_2fa(user: Union[Student, Teacher, Admin]) -> bool:
     Returns:
         True if user has 2FA enabled, False otherwise
     """
-    # Students and Teachers can have 2FA
-    if isinstance(user, Student):
-        return hasattr(user, 'has_2fa') and user.has_2fa
-    elif isinstance(user, Teacher):
-        return hasattr(user, 'has_2fa') and user.has_2fa
-    return False
+    # Students and Teachers can have 2FA (both models carry the has_2fa column)
+    return type(user) in _2FA_MODELS and bool(user.has_2fa)
 
 
 def get_totp_secret(user: Union[Student, Teacher, Admin]) -> Optional[str]:
@@ -119,8 +265,8 @@ def get_totp_secret(user: Union[Student, Teacher, Admin]) -> Optional[str]:
     Returns:
         TOTP secret if available, None otherwise
     """
-    if isinstance(user, Student) or isinstance(user, Teacher):
-        return user.totp_secret if hasattr(user, 'totp_secret') else None
+    if type(user) in _2FA_MODELS:
+        return user.totp_secret
     return None
 
 
@@ -131,12 +277,9 @@ def set_totp_secret(user: Union[Student, Teacher, Admin], totp_secret: Optional[
         user: User object (Student, Teacher, or Admin)
         totp_secret: TOTP secret to set
     """
-    if isinstance(user, Student) or isinstance(user, Teacher):
+    if type(user) in _2FA_MODELS:
         user.totp_secret = totp_secret
-        if totp_secret:
-            user.has_2fa = True
-        else:
-            user.has_2fa = False
+        user.has_2fa = bool(totp_secret)
     # Admins don't have 2FA
 
 
@@ -149,4 +292,4 @@ def is_active(user: Union[Student, Teacher, Admin]) -> bool:
     Returns:
         True if user is active, False otherwise
     """
-    return user.is_active if hasattr(user, 'is_active') else True
+    return user.is_active if type(user) in _ACTIVE_FLAG_MODELS else True
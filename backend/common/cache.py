@@ -0,0 +1,115 @@
+"""Small in-process caches with per-entry expiry"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from threading import Lock
+
+
+class TTLCache:
+    """Bounded cache whose entries expire ttl seconds after they are set.
+
+    Entries all share one TTL, so insertion order is also expiry order and
+    the oldest entry is evicted first when the cache is full.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self.lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Cache value under key for ttl seconds"""
+        with self.lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove key and return its value (expired entries return default)"""
+        with self.lock:
+            item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def clear(self):
+        """Drop every entry"""
+        with self.lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self._data)
+
+
+class SingleFlight:
+    """Coalesce concurrent async calls that share a key into one execution.
+
+    The first caller for a key runs the call; callers arriving while it is
+    in flight await the same result (or exception). Nothing is kept once
+    the call finishes, so this never serves stale results.
+
+    If the caller running the call is cancelled, the callers waiting on it
+    are not: they retry, and one of them runs the call again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Run await func(*args), or join the in-flight call for key"""
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                # Shielded so a cancelled follower does not cancel the shared call
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()  # mark retrieved when there are no followers
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when there are no followers
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+class _LeaderCancelled(Exception):
+    """Tells SingleFlight followers that the call they joined was abandoned"""
+
+
+_MISSING = object()
@@ -0,0 +1,113 @@
+"""Retry and circuit breaker helpers for inter-service calls"""
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+from dataclasses import dataclass, field
+from threading import Lock
+
+import httpx
+
+
+# Errors raised before a request was sent, so retrying cannot repeat a
+# write the server already applied (unlike read timeouts or dropped responses)
+RETRY_SAFE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open"""
+
+
+@dataclass
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After fail_max consecutive failures the circuit opens and calls are
+    rejected immediately. Once reset_timeout seconds have passed the circuit
+    is half-open: a single trial call is let through, and other calls are
+    rejected until it finishes. Success closes the circuit again, failure
+    re-opens it.
+    """
+    fail_max: int = 5
+    reset_timeout: float = 30.0
+    failures: int = field(default=0, init=False)
+    opened_at: Optional[float] = field(default=None, init=False)
+    half_open: bool = field(default=False, init=False)
+    lock: Lock = field(default_factory=Lock, init=False)
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.half_open:
+                # The trial call is still running
+                return False
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.half_open = True
+                return True
+            return False
+
+    def record_success(self):
+        """Reset the failure count after a successful call"""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open = False
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit at fail_max (or re-opening
+        it when the trial call failed)"""
+        with self.lock:
+            self.failures += 1
+            if self.half_open or self.failures >= self.fail_max:
+                self.opened_at = time.monotonic()
+                self.half_open = False
+
+    def record_abandoned(self):
+        """Forget a call that ended without an outcome (e.g. was cancelled).
+        If it was the trial call, the next caller becomes the trial."""
+        with self.lock:
+            self.half_open = False
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await func(*args, **kwargs) through the breaker"""
+        if not self.allow():
+            raise CircuitOpenError("Circuit is open")
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_abandoned()
+            raise
+        self.record_success()
+        return result
+
+
+async def retry_async(
+    func: Callable[..., Awaitable[Any]],
+    *args,
+    attempts: int = 3,
+    initial_wait: float = 0.05,
+    max_wait: float = 0.5,
+    retry_on: Tuple[Type[BaseException], ...] = RETRY_SAFE_ERRORS,
+    **kwargs
+) -> Any:
+    """Await func(*args, **kwargs), retrying on retry_on exceptions.
+
+    The default only retries errors where the request never reached the
+    server; pass wider retry_on only for idempotent calls.
+
+    Waits grow exponentially from initial_wait up to max_wait with full
+    jitter between attempts. The last exception is re-raised.
+    """
+    for attempt in range(attempts):
+        try:
+            return await func(*args, **kwargs)
+        except retry_on:
+            if attempt == attempts - 1:
+                raise
+            wait = min(max_wait, initial_wait * (2 ** attempt))
+            await asyncio.sleep(random.uniform(0, wait))
@@ -4,15 +4,59 @@ Provides command-line interface for managing users, courses, and system operatio
 """
 import click
 import asyncio
+import atexit
 import httpx
 import os
+from contextlib import nullcontext
 from typing import Optional
 from pathlib import Path
 from datetime import datetime
-import json
+import orjson
 from getpass import getpass
 from tabulate import tabulate
 
+try:
+    import uvloop  # Installed with uvicorn[standard], except on Windows
+except ImportError:
+    uvloop = None
+
+
+# Users fetched per request by `user list`
+LIST_PAGE_SIZE = 500
+
+
+# One event loop and one pooled HTTP client for the whole process, so the
+# commands of a `batch` run reuse keep-alive connections instead of opening
+# new ones for every command
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_CLI_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+_CLI_TIMEOUT = httpx.Timeout(30.0)
+
+
+def run(coro):
+    """Run a command's coroutine on the process-wide event loop"""
+    global _loop
+    if _loop is None:
+        _loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+        atexit.register(_shutdown)
+    return _loop.run_until_complete(coro)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared HTTP client for all commands (call from inside run())"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(limits=_CLI_LIMITS, timeout=_CLI_TIMEOUT)
+    return _http_client
+
+
+def _shutdown():
+    """Close the shared client and the event loop at exit"""
+    if _http_client is not None:
+        _loop.run_until_complete(_http_client.aclose())
+    _loop.close()
+
 
 class CLIClient:
     """HTTP/Socket client for CLI operations"""
@@ -25,20 +69,20 @@ class CLIClient:
     
     async def login_admin(self, username: str, password: str) -> bool:
         """Login as admin"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.auth_url}/admin/login",
-                    json={"username": username, "password": password}
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    self.admin_token = data["access_token"]
-                    return True
-                return False
-            except Exception as e:
-                click.echo(f"Login failed: {e}", err=True)
-                return False
+        client = get_http_client()
+        try:
+            response = await client.post(
+                f"{self.auth_url}/admin/login",
+                json={"username": username, "password": password}
+            )
+            if response.status_code == 200:
+                data = response.json()
+                self.admin_token = data["access_token"]
+                return True
+            return False
+        except Exception as e:
+            click.echo(f"Login failed: {e}", err=True)
+            return False
     
     def get_headers(self):
         """Get request headers"""
@@ -74,7 +118,7 @@ def login(username: str, password: str, auth_url: str, internal_token: str):
             config_dir = Path.home() / '.course_selection'
             config_dir.mkdir(exist_ok=True)
             config_file = config_dir / 'config.json'
-            config_file.write_text(json.dumps({
+            config_file.write_bytes(orjson.dumps({
                 'admin_token': client.admin_token,
                 'auth_url': auth_url,
                 'internal_token': internal_token,
@@ -84,7 +128,7 @@ def login(username: str, password: str, auth_url: str, internal_token: str):
         else:
             click.echo(click.style('✗ Login failed', fg='red'))
     
-    asyncio.run(_login())
+    run(_login())
 
 
 @user.command()
@@ -103,46 +147,46 @@ def add_student(username: str, password: str, name: str, email: str, group: str)
                           config['internal_token'])
         client.admin_token = config['admin_token']
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            # Generate registration code
-            try:
-                response = await http_client.post(
-                    f"{config['auth_url']}/admin/registration-codes",
-                    json={"user_type": "student", "max_uses": 1},
-                    headers=client.get_headers()
-                )
-                if response.status_code != 200:
-                    click.echo(click.style(f'✗ Failed to generate registration code', fg='red'))
-                    return
-                
-                reg_code = response.json()['code']
-                
-                # Register student
-                response = await http_client.post(
-                    f"{config['auth_url']}/register",
-                    json={
-                        "username": username,
-                        "password": password,
-                        "name": name,
-                        "email": email,
-                        "registration_code": reg_code
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    click.echo(click.style('✓ Student created successfully', fg='green'))
-                    click.echo(f"  ID: {data['id']}")
-                    click.echo(f"  Username: {data['username']}")
-                    click.echo(f"  2FA Secret: {data['totp_secret']}")
-                    click.echo(f"  2FA QR URI: {data['totp_uri']}")
-                else:
-                    click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        http_client = get_http_client()
+        # Generate registration code
+        try:
+            response = await http_client.post(
+                f"{config['auth_url']}/admin/registration-codes",
+                json={"user_type": "student", "max_uses": 1},
+                headers=client.get_headers()
+            )
+            if response.status_code != 200:
+                click.echo(click.style(f'✗ Failed to generate registration code', fg='red'))
+                return
+            
+            reg_code = response.json()['code']
+            
+            # Register student
+            response = await http_client.post(
+                f"{config['auth_url']}/register",
+                json={
+                    "username": username,
+                    "password": password,
+                    "name": name,
+                    "email": email,
+                    "registration_code": reg_code
+                }
+            )
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            if response.status_code == 200:
+                data = response.json()
+                click.echo(click.style('✓ Student created successfully', fg='green'))
+                click.echo(f"  ID: {data['id']}")
+                click.echo(f"  Username: {data['username']}")
+                click.echo(f"  2FA Secret: {data['totp_secret']}")
+                click.echo(f"  2FA QR URI: {data['totp_uri']}")
+            else:
+                click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_add())
+    run(_add())
 
 
 @user.command()
@@ -155,46 +199,46 @@ def add_teacher(username: str, password: str, name: str, email: str):
     async def _add():
         config = load_config()
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            try:
-                # Generate registration code
-                response = await http_client.post(
-                    f"{config['auth_url']}/admin/registration-codes",
-                    json={"user_type": "teacher", "max_uses": 1},
-                    headers={"Authorization": f"Bearer {config['admin_token']}",
-                            "Internal-Token": config['internal_token']}
-                )
-                
-                if response.status_code != 200:
-                    click.echo(click.style(f'✗ Failed to generate registration code', fg='red'))
-                    return
-                
-                reg_code = response.json()['code']
-                
-                # Register teacher
-                response = await http_client.post(
-                    f"{config['auth_url']}/register/teacher",
-                    json={
-                        "username": username,
-                        "password": password,
-                        "name": name,
-                        "email": email,
-                        "registration_code": reg_code
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    click.echo(click.style('✓ Teacher created successfully', fg='green'))
-                    click.echo(f"  ID: {data['id']}")
-                    click.echo(f"  Username: {data['username']}")
-                else:
-                    click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        http_client = get_http_client()
+        try:
+            # Generate registration code
+            response = await http_client.post(
+                f"{config['auth_url']}/admin/registration-codes",
+                json={"user_type": "teacher", "max_uses": 1},
+                headers={"Authorization": f"Bearer {config['admin_token']}",
+                        "Internal-Token": config['internal_token']}
+            )
+            
+            if response.status_code != 200:
+                click.echo(click.style(f'✗ Failed to generate registration code', fg='red'))
+                return
+            
+            reg_code = response.json()['code']
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            # Register teacher
+            response = await http_client.post(
+                f"{config['auth_url']}/register/teacher",
+                json={
+                    "username": username,
+                    "password": password,
+                    "name": name,
+                    "email": email,
+                    "registration_code": reg_code
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                click.echo(click.style('✓ Teacher created successfully', fg='green'))
+                click.echo(f"  ID: {data['id']}")
+                click.echo(f"  Username: {data['username']}")
+            else:
+                click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_add())
+    run(_add())
 
 
 @user.command()
@@ -205,38 +249,46 @@ def list(user_type: str):
     async def _list():
         config = load_config()
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            try:
-                if user_type == 'student':
-                    response = await http_client.get(
-                        f"{os.getenv('DATA_NODE_URL', 'http://localhost:8001')}/students",
-                        headers={"Internal-Token": config['internal_token']}
-                    )
-                else:
-                    response = await http_client.get(
-                        f"{os.getenv('DATA_NODE_URL', 'http://localhost:8001')}/teachers",
-                        headers={"Internal-Token": config['internal_token']}
-                    )
-                
-                if response.status_code == 200:
-                    users = response.json()
-                    if not users:
-                        click.echo(f"No {user_type}s found")
-                        return
-                    
-                    # Format as table
-                    headers = ['ID', 'Username', 'Name', 'Email']
-                    rows = [[u['id'], u['username'], u['name'], u['email']] for u in users]
-                    click.echo(tabulate(rows, headers=headers, tablefmt='grid'))
-                else:
+        http_client = get_http_client()
+        try:
+            # Page through the auth node's listing and print each page as it
+            # arrives, so memory stays flat however many users there are
+            shown = 0
+            page = 1
+            while True:
+                response = await http_client.get(
+                    f"{config['auth_url']}/admin/users",
+                    params={"user_type": user_type, "page": page, "page_size": LIST_PAGE_SIZE},
+                    headers={"Internal-Token": config['internal_token']}
+                )
+                if response.status_code != 200:
                     # Show status and body to help debugging (e.g. invalid Internal-Token)
                     msg = response.text or '<no body>'
                     click.echo(click.style(f'✗ Failed to fetch users - {response.status_code}: {msg}', fg='red'))
+                    return
+                
+                data = orjson.loads(response.content)
+                users = data.get('users', [])
+                if not users:
+                    break
+                
+                rows = [[u['user_id'], u['username'], u['is_active'], u['created_at']] for u in users]
+                if page == 1:
+                    click.echo(tabulate(rows, headers=['ID', 'Username', 'Active', 'Created'], tablefmt='plain'))
+                else:
+                    click.echo(tabulate(rows, tablefmt='plain'))
+                shown += len(users)
+                if shown >= data.get('total', 0):
+                    break
+                page += 1
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            if not shown:
+                click.echo(f"No {user_type}s found")
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_list())
+    run(_list())
 
 
 @user.command()
@@ -251,23 +303,23 @@ def delete(user_id: int, user_type: str):
     async def _delete():
         config = load_config()
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            try:
-                endpoint = 'students' if user_type == 'student' else 'teachers'
-                response = await http_client.delete(
-                    f"{os.getenv('DATA_NODE_URL', 'http://localhost:8001')}/{endpoint}/{user_id}",
-                    headers={"Internal-Token": config['internal_token']}
-                )
-                
-                if response.status_code == 200:
-                    click.echo(click.style(f'✓ {user_type.capitalize()} deleted successfully', fg='green'))
-                else:
-                    click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        http_client = get_http_client()
+        try:
+            endpoint = 'students' if user_type == 'student' else 'teachers'
+            response = await http_client.delete(
+                f"{os.getenv('DATA_NODE_URL', 'http://localhost:8001')}/{endpoint}/{user_id}",
+                headers={"Internal-Token": config['internal_token']}
+            )
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            if response.status_code == 200:
+                click.echo(click.style(f'✓ {user_type.capitalize()} deleted successfully', fg='green'))
+            else:
+                click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_delete())
+    run(_delete())
 
 
 @user.command()
@@ -277,27 +329,27 @@ def reset_2fa(username: str):
     async def _reset():
         config = load_config()
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            try:
-                response = await http_client.post(
-                    f"{config['auth_url']}/admin/reset-codes",
-                    json={"username": username},
-                    headers={"Authorization": f"Bearer {config['admin_token']}",
-                            "Internal-Token": config['internal_token']}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    click.echo(click.style('✓ 2FA reset code generated', fg='green'))
-                    click.echo(f"  Reset Code: {data['code']}")
-                    click.echo(f"  Valid until: {data['expires_at']}")
-                else:
-                    click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        http_client = get_http_client()
+        try:
+            response = await http_client.post(
+                f"{config['auth_url']}/admin/reset-codes",
+                json={"username": username},
+                headers={"Authorization": f"Bearer {config['admin_token']}",
+                        "Internal-Token": config['internal_token']}
+            )
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            if response.status_code == 200:
+                data = response.json()
+                click.echo(click.style('✓ 2FA reset code generated', fg='green'))
+                click.echo(f"  Reset Code: {data['code']}")
+                click.echo(f"  Valid until: {data['expires_at']}")
+            else:
+                click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_reset())
+    run(_reset())
 
 
 @cli.group()
@@ -315,29 +367,29 @@ def generate(user_type: str, max_uses: int):
     async def _generate():
         config = load_config()
         
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            try:
-                response = await http_client.post(
-                    f"{config['auth_url']}/admin/registration-codes",
-                    json={"user_type": user_type, "max_uses": max_uses},
-                    headers={"Authorization": f"Bearer {config['admin_token']}",
-                            "Internal-Token": config['internal_token']}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    click.echo(click.style('✓ Registration code generated', fg='green'))
-                    click.echo(f"  Code: {data['code']}")
-                    click.echo(f"  Type: {data['user_type']}")
-                    click.echo(f"  Max uses: {data['max_uses']}")
-                    click.echo(f"  Valid until: {data['expires_at']}")
-                else:
-                    click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        http_client = get_http_client()
+        try:
+            response = await http_client.post(
+                f"{config['auth_url']}/admin/registration-codes",
+                json={"user_type": user_type, "max_uses": max_uses},
+                headers={"Authorization": f"Bearer {config['admin_token']}",
+                        "Internal-Token": config['internal_token']}
+            )
             
-            except Exception as e:
-                click.echo(click.style(f'✗ Error: {e}', fg='red'))
+            if response.status_code == 200:
+                data = response.json()
+                click.echo(click.style('✓ Registration code generated', fg='green'))
+                click.echo(f"  Code: {data['code']}")
+                click.echo(f"  Type: {data['user_type']}")
+                click.echo(f"  Max uses: {data['max_uses']}")
+                click.echo(f"  Valid until: {data['expires_at']}")
+            else:
+                click.echo(click.style(f'✗ Failed: {response.text}', fg='red'))
+        
+        except Exception as e:
+            click.echo(click.style(f'✗ Error: {e}', fg='red'))
     
-    asyncio.run(_generate())
+    run(_generate())
 
 
 @cli.group()
@@ -351,7 +403,7 @@ def import_cmd():
 @click.option('--user-type', type=click.Choice(['student', 'teacher']),
               required=True, help='User type to import')
 @click.option('--generate-passwords', is_flag=True, help='Generate random passwords')
-@click.option('--output', type=click.Path(), help='Output CSV file with results')
+@click.option('--output', type=click.Path(), help='Write per-row results to this file as JSON lines')
 def csv(csv_file: str, user_type: str, generate_passwords: bool, output: Optional[str]):
     """Import users from CSV file"""
     click.echo(f"Importing {user_type}s from {csv_file}...")
@@ -364,29 +416,29 @@ def csv(csv_file: str, user_type: str, generate_passwords: bool, output: Optiona
         async with UserImporter(
             config['auth_url'],
             os.getenv('DATA_NODE_URL', 'http://localhost:8001'),
-            config['internal_token']
+            config['internal_token'],
+            client=get_http_client(),
         ) as importer:
-            results = await importer.import_from_csv(
-                Path(csv_file),
-                config['admin_token'],
-                user_type,
-                generate_passwords
-            )
+            # Results go straight to the output file (line buffered, so it
+            # can be followed while the import runs) rather than into memory
+            with open(output, 'w', encoding='utf-8', buffering=1) if output else nullcontext() as results_writer:
+                results = await importer.import_from_csv(
+                    Path(csv_file),
+                    config['admin_token'],
+                    user_type,
+                    generate_passwords,
+                    results_writer=results_writer
+                )
             
             click.echo(f"\n{click.style('Import Results:', bold=True)}")
             click.echo(f"  Total: {results['total']}")
-            click.echo(f"  {click.style('Success:', fg='green')} {results['success']}")
-            click.echo(f"  {click.style('Failed:', fg='red')} {results['failed']}")
+            click.echo(f"  {click.style('Success:', fg='green')} {results['success_count']}")
+            click.echo(f"  {click.style('Failed:', fg='red')} {results['failed_count']}")
             
-            if output and results.get('details'):
-                import csv as csv_module
-                with open(output, 'w', newline='') as f:
-                    writer = csv_module.DictWriter(f, fieldnames=['username', 'status', 'message'])
-                    writer.writeheader()
-                    writer.writerows(results['details'])
+            if output:
                 click.echo(f"\nDetails written to {output}")
     
-    asyncio.run(_import())
+    run(_import())
 
 
 @cli.command()
@@ -403,18 +455,99 @@ def status():
         
         click.echo(click.style('System Status:', bold=True))
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            for name, url in services:
-                try:
-                    response = await client.get(f"{url}/health")
-                    if response.status_code == 200:
-                        click.echo(f"  {click.style('●', fg='green')} {name}: {click.style('online', fg='green')}")
-                    else:
-                        click.echo(f"  {click.style('●', fg='yellow')} {name}: {click.style('degraded', fg='yellow')}")
-                except:
-                    click.echo(f"  {click.style('●', fg='red')} {name}: {click.style('offline', fg='red')}")
+        # Check all services at once: the wait is the slowest one, not the sum
+        client = get_http_client()
+        responses = await asyncio.gather(
+            *(client.get(f"{url}/health", timeout=5.0) for _, url in services),
+            return_exceptions=True,
+        )
+        for (name, _), response in zip(services, responses):
+            if isinstance(response, Exception):
+                click.echo(f"  {click.style('●', fg='red')} {name}: {click.style('offline', fg='red')}")
+            elif response.status_code == 200:
+                click.echo(f"  {click.style('●', fg='green')} {name}: {click.style('online', fg='green')}")
+            else:
+                click.echo(f"  {click.style('●', fg='yellow')} {name}: {click.style('degraded', fg='yellow')}")
     
-    asyncio.run(_status())
+    run(_status())
+
+
+@cli.command()
+@click.option('--target-ms', default=250, help='Slowest acceptable time per hash, in milliseconds')
+@click.option('--parallelism', default=1, help='Argon2 lanes per hash')
+def bench_hash(target_ms: int, parallelism: int):
+    """Time Argon2id password hashing costs on this machine"""
+    try:
+        from argon2 import PasswordHasher
+    except ImportError:
+        click.echo(click.style('✗ argon2-cffi is not installed', fg='red'))
+        return
+    import time
+
+    PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash('warm-up')
+
+    rows = []
+    best = None  # (memory_cost, time_cost) doing the most work within the target
+    for memory_cost in (19456, 47104, 65536, 131072):  # KiB
+        for time_cost in (1, 2, 3, 4):
+            hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+            start = time.perf_counter()
+            hasher.hash('benchmark-password')
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            rows.append([memory_cost // 1024, time_cost, f'{elapsed_ms:.0f}'])
+            if elapsed_ms <= target_ms and (best is None or memory_cost * time_cost > best[0] * best[1]):
+                best = (memory_cost, time_cost)
+
+    click.echo(tabulate(rows, headers=['Memory (MiB)', 'Time cost', 'ms / hash'], tablefmt='grid'))
+    if best is None:
+        click.echo(click.style(f'✗ No setting hashes within {target_ms} ms on this machine', fg='yellow'))
+        return
+    click.echo(f"\n{click.style('Suggested auth node environment:', bold=True)}")
+    click.echo(f'  ARGON2_MEMORY_COST={best[0]}')
+    click.echo(f'  ARGON2_TIME_COST={best[1]}')
+    click.echo(f'  ARGON2_PARALLELISM={parallelism}')
+
+
+@cli.command()
+@click.argument('commands', type=click.File('r'), default='-')
+def batch(commands):
+    """Run many commands in one process, read as JSON lines
+
+    Each line is an object such as
+    {"cmd": "user add-teacher", "username": "t1", "password": "...", "name": "T", "email": "t@x"}.
+    Positional arguments go in an "args" list and the remaining keys become
+    --options. Python startup and imports are paid once for the whole batch.
+    Commands that ask for confirmation read it from the terminal, so pass
+    the batch as a file rather than on stdin when using them.
+    """
+    for line_num, line in enumerate(commands, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = orjson.loads(line)
+            argv = request.pop('cmd').split() + [str(arg) for arg in request.pop('args', [])]
+        except (ValueError, KeyError, AttributeError, TypeError):
+            click.echo(click.style(f'✗ Line {line_num}: expected a JSON object with a "cmd" key', fg='red'), err=True)
+            continue
+
+        for key, value in request.items():
+            option = '--' + key.replace('_', '-')
+            if value is True:
+                argv.append(option)
+            elif value is not False and value is not None:
+                argv += [option, str(value)]
+
+        try:
+            cli.main(args=argv, prog_name='course-cli', standalone_mode=False)
+        except click.ClickException as e:
+            e.show()
+        except click.Abort:
+            click.echo(click.style(f'✗ Line {line_num}: aborted', fg='red'), err=True)
+
+
+# (config file mtime, parsed config) from the last load_config() call
+_cached_config: Optional[tuple] = None
 
 
 def load_config():
@@ -438,12 +571,20 @@ def load_config():
             'login_time': datetime.now().isoformat()
         }
 
+    global _cached_config
     config_file = Path.home() / '.course_selection' / 'config.json'
-    if not config_file.exists():
+    try:
+        mtime = config_file.stat().st_mtime_ns
+    except FileNotFoundError:
         click.echo(click.style('✗ Not logged in. Please run: course-cli user login', fg='red'))
         raise click.Abort()
 
-    config = json.loads(config_file.read_text())
+    # Re-read only when the file changed (e.g. after `user login`)
+    if _cached_config is not None and _cached_config[0] == mtime:
+        config = _cached_config[1]
+    else:
+        config = orjson.loads(config_file.read_bytes())
+        _cached_config = (mtime, config)
 
     # Check if token is still valid (simple time-based check)
     login_time = datetime.fromisoformat(config['login_time'])
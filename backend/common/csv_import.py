@@ -5,26 +5,64 @@ Supports batch import of students and teachers.
 import csv
 import asyncio
 import httpx
-from typing import List, Dict, Optional
+import orjson
+from typing import Iterator, List, Dict, Optional, TextIO, Tuple
 from pathlib import Path
 import sys
 
+# Rows per registration code request (the auth node's per-request maximum)
+REGISTRATION_CODE_BATCH_SIZE = 100
+
+# Lifetime of the codes minted for an import. They are used within moments,
+# so any left over by a failed registration should not stay valid for long.
+REGISTRATION_CODE_EXPIRES_DAYS = 1
+
+# Users registered at the same time
+IMPORT_CONCURRENCY = 20
+
+# Display names set per data node request (the data node's maximum is 1000)
+RENAME_BATCH_SIZE = 500
+
+# Registration queues the data node record and the auth node delivers it just
+# after; renames of records not there yet are retried after these delays
+RENAME_RETRY_DELAYS = (0.5, 2.0, 5.0)
+
+# Client settings for an importer that owns its client: enough pooled
+# keep-alive connections for every concurrent import to reuse one
+IMPORT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=IMPORT_CONCURRENCY)
+IMPORT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Read buffer for the CSV file
+CSV_READ_BUFFER = 1 << 20
+
+
+def iter_rows(csv_path: Path) -> Iterator[Dict[str, str]]:
+    """Yield the rows of a CSV file as dicts, one at a time"""
+    with open(csv_path, 'r', encoding='utf-8', newline='', buffering=CSV_READ_BUFFER) as f:
+        yield from csv.DictReader(f)
+
 
 class UserImporter:
     """Import users from CSV file"""
     
-    def __init__(self, auth_url: str, data_url: str, internal_token: str):
+    def __init__(self, auth_url: str, data_url: str, internal_token: str,
+                 client: Optional[httpx.AsyncClient] = None):
         self.auth_url = auth_url
         self.data_url = data_url
         self.internal_token = internal_token
-        self.client = None
+        # A client passed in is shared with the caller, who closes it
+        self.client = client
+        self._owns_client = client is None
+        # Where the running import streams per-row results, if anywhere
+        self._results_writer = None
     
     async def __aenter__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+        if self._owns_client:
+            self.client = httpx.AsyncClient(limits=IMPORT_LIMITS, timeout=IMPORT_TIMEOUT)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.client:
+        if self._owns_client and self.client:
             await self.client.aclose()
     
     async def import_from_csv(
@@ -32,7 +70,9 @@ class UserImporter:
         csv_path: Path,
         admin_token: str,
         user_type: str = "student",
-        generate_passwords: bool = False
+        generate_passwords: bool = False,
+        max_concurrency: int = IMPORT_CONCURRENCY,
+        results_writer: Optional[TextIO] = None
     ) -> Dict[str, any]:
         """
         Import users from CSV file.
@@ -45,98 +85,271 @@ class UserImporter:
             admin_token: Admin access token
             user_type: Type of user (student/teacher)
             generate_passwords: If True, generate random passwords
+            max_concurrency: Most users being registered at the same time
+            results_writer: If given, per-row results are written to it as
+                JSON lines (with a "status" of "ok" or "fail") instead of
+                being collected, so memory use does not grow with the file
         
         Returns:
-            Dictionary with import results
+            Dictionary with import results (in completion order)
         """
         results = {
             "success": [],
             "failed": [],
+            "success_count": 0,
+            "failed_count": 0,
             "total": 0
         }
+        self._results_writer = results_writer
+        try:
+            await self._import_rows(csv_path, admin_token, user_type, generate_passwords, max_concurrency, results)
+        finally:
+            self._results_writer = None
+        return results
+    
+    async def _import_rows(
+        self,
+        csv_path: Path,
+        admin_token: str,
+        user_type: str,
+        generate_passwords: bool,
+        max_concurrency: int,
+        results: Dict[str, any]
+    ):
+        """Import the rows of csv_path, recording outcomes in results"""
+        # Imports run as a sliding window: a slow row only holds its own
+        # slot, and the next batch's codes are fetched while others finish
+        semaphore = asyncio.Semaphore(max_concurrency)
+        pending = set()
+        
+        # Registered rows whose display name still has to be set
+        renames = []
         
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        # Valid rows wait here until a full batch can share one code request
+        batch = []
+        
+        for row in iter_rows(csv_path):
+            results["total"] += 1
+            username = row.get("username")
+            password = row.get("password")
+            name = row.get("name", username)
+            
+            if not username:
+                self._report(results, False, {
+                    "row": results["total"],
+                    "error": "Missing username"
+                })
+                continue
+            
+            if not password and not generate_passwords:
+                self._report(results, False, {
+                    "row": results["total"],
+                    "username": username,
+                    "error": "Missing password"
+                })
+                continue
+            
+            # Generate password if needed
+            if generate_passwords:
+                import secrets
+                password = secrets.token_urlsafe(12)
             
-            for row in reader:
-                results["total"] += 1
-                username = row.get("username")
-                password = row.get("password")
-                name = row.get("name", username)
-                
-                if not username:
-                    results["failed"].append({
-                        "row": results["total"],
-                        "error": "Missing username"
-                    })
-                    continue
-                
-                if not password and not generate_passwords:
-                    results["failed"].append({
-                        "row": results["total"],
-                        "username": username,
-                        "error": "Missing password"
-                    })
-                    continue
-                
-                # Generate password if needed
-                if generate_passwords:
-                    import secrets
-                    password = secrets.token_urlsafe(12)
-                
-                # Import user
-                try:
-                    success = await self._import_single_user(
-                        username=username,
-                        password=password,
-                        name=name,
-                        user_type=user_type,
-                        admin_token=admin_token
-                    )
-                    
-                    if success:
-                        results["success"].append({
-                            "username": username,
-                            "name": name,
-                            "password": password if generate_passwords else "***"
-                        })
-                    else:
-                        results["failed"].append({
-                            "username": username,
-                            "error": "Import failed"
-                        })
-                except Exception as e:
-                    results["failed"].append({
-                        "username": username,
-                        "error": str(e)
-                    })
+            batch.append((username, password, name))
+            if len(batch) == REGISTRATION_CODE_BATCH_SIZE:
+                await self._start_batch(batch, user_type, admin_token, semaphore, pending, results)
+                batch = []
+                # Don't read further ahead than one more batch
+                while len(pending) > REGISTRATION_CODE_BATCH_SIZE:
+                    await self._collect(pending, renames, user_type, generate_passwords, results)
         
-        return results
+        if batch:
+            await self._start_batch(batch, user_type, admin_token, semaphore, pending, results)
+        while pending:
+            await self._collect(pending, renames, user_type, generate_passwords, results)
+        if renames:
+            await self._rename_batch(renames, user_type, generate_passwords, results)
     
-    async def _import_single_user(
+    async def _start_batch(
         self,
-        username: str,
-        password: str,
-        name: str,
+        batch: List[Tuple[str, str, str]],
         user_type: str,
-        admin_token: str
-    ) -> bool:
-        """Import a single user"""
+        admin_token: str,
+        semaphore: asyncio.Semaphore,
+        pending: set,
+        results: Dict[str, any]
+    ):
+        """Get registration codes for (username, password, name) rows in one
+        request, then start importing each row as a task added to pending"""
+        error = "Failed to generate registration code"
+        try:
+            codes = await self._generate_registration_codes(len(batch), user_type, admin_token)
+        except Exception as e:
+            codes, error = None, str(e)
+        if codes is None:
+            for username, _, _ in batch:
+                self._report(results, False, {
+                    "username": username,
+                    "error": error
+                })
+            return
+        
+        for row, reg_code in zip(batch, codes):
+            pending.add(asyncio.create_task(self._import_bounded(semaphore, row, user_type, reg_code)))
+    
+    async def _import_bounded(
+        self,
+        semaphore: asyncio.Semaphore,
+        row: Tuple[str, str, str],
+        user_type: str,
+        reg_code: str
+    ) -> Tuple[Tuple[str, str, str], object]:
+        """Import one row once a slot is free; returns (row, success or exception)"""
+        username, password, _ = row
+        async with semaphore:
+            try:
+                return row, await self._import_single_user(
+                    username=username,
+                    password=password,
+                    user_type=user_type,
+                    reg_code=reg_code
+                )
+            except Exception as e:
+                return row, e
+    
+    async def _collect(
+        self,
+        pending: set,
+        renames: List[Tuple[str, str, str]],
+        user_type: str,
+        generate_passwords: bool,
+        results: Dict[str, any]
+    ):
+        """Wait for at least one import task and move finished ones from
+        pending into results (or renames, when the row has a display name)"""
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            pending.discard(task)
+            row, success = task.result()
+            username, _, name = row
+            if isinstance(success, Exception):
+                self._report(results, False, {
+                    "username": username,
+                    "error": str(success)
+                })
+            elif not success:
+                self._report(results, False, {
+                    "username": username,
+                    "error": "Import failed"
+                })
+            elif name != username:
+                renames.append(row)
+            else:
+                self._record_success(row, generate_passwords, results)
+        
+        if len(renames) >= RENAME_BATCH_SIZE:
+            await self._rename_batch(renames, user_type, generate_passwords, results)
+    
+    async def _rename_batch(
+        self,
+        renames: List[Tuple[str, str, str]],
+        user_type: str,
+        generate_passwords: bool,
+        results: Dict[str, any]
+    ):
+        """Set the data node display name of registered (username, password, name)
+        rows in one request, record them, and empty renames"""
+        # Registration names the data node record after the username
+        names = {username: name for username, _, name in renames}
+        errors = {}
+        for delay in (*RENAME_RETRY_DELAYS, None):
+            try:
+                response = await self.client.post(
+                    f"{self.data_url}/bulk/rename/{user_type}s",
+                    json=names,
+                    headers={"Internal-Token": self.internal_token}
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code}")
+                batch_errors = response.json()["errors"]
+            except Exception as e:
+                batch_errors = dict.fromkeys(names, str(e))
+            
+            errors.update(batch_errors)
+            names = {
+                username: names[username]
+                for username, error in batch_errors.items()
+                if error.endswith("not found")
+            }
+            if not names or delay is None:
+                break
+            for username in names:
+                del errors[username]
+            await asyncio.sleep(delay)
         
-        # Step 1: Generate registration code
+        for row in renames:
+            error = errors.get(row[0])
+            if error:
+                self._report(results, False, {
+                    "username": row[0],
+                    "error": f"Registered, but setting the name failed: {error}"
+                })
+            else:
+                self._record_success(row, generate_passwords, results)
+        renames.clear()
+    
+    def _record_success(self, row: Tuple[str, str, str], generate_passwords: bool, results: Dict[str, any]):
+        username, password, name = row
+        self._report(results, True, {
+            "username": username,
+            "name": name,
+            "password": password if generate_passwords else "***"
+        })
+    
+    def _report(self, results: Dict[str, any], ok: bool, entry: Dict[str, any]):
+        """Count one row's outcome and collect it, or stream it to the results writer"""
+        key = "success" if ok else "failed"
+        results[key + "_count"] += 1
+        if self._results_writer is None:
+            results[key].append(entry)
+        else:
+            entry["status"] = "ok" if ok else "fail"
+            self._results_writer.write(orjson.dumps(entry).decode() + "\n")
+    
+    async def _generate_registration_codes(
+        self,
+        count: int,
+        user_type: str,
+        admin_token: str
+    ) -> Optional[List[str]]:
+        """Generate count single-use registration codes in one request"""
         response = await self.client.post(
             f"{self.auth_url}/generate/registration-code",
-            json={"user_type": user_type, "expires_days": 30},
+            json={"user_type": user_type, "expires_days": REGISTRATION_CODE_EXPIRES_DAYS, "count": count},
             headers={"Authorization": f"Bearer {admin_token}"}
         )
         
         if response.status_code not in [200, 201]:
-            print(f"Failed to generate registration code for {username}")
-            return False
+            print(f"Failed to generate {count} registration code(s)")
+            return None
         
-        reg_code = response.json()["code"]
+        data = response.json()
+        # A single code comes back unwrapped
+        if count == 1:
+            return [data["code"]]
+        return [code["code"] for code in data["codes"]]
+    
+    async def _import_single_user(
+        self,
+        username: str,
+        password: str,
+        user_type: str,
+        reg_code: str
+    ) -> bool:
+        """Register a single user with an already generated registration code.
         
-        # Step 2: Register user in auth system
+        Registration also queues the user's data node record, named after
+        the username; display names are set afterwards in batches.
+        """
         response = await self.client.post(
             f"{self.auth_url}/register/v1",
             json={
@@ -151,20 +364,6 @@ class UserImporter:
             print(f"Failed to register {username}: {response.text}")
             return False
         
-        # Step 3: Add to data node
-        endpoint = f"/add/{'student' if user_type == 'student' else 'teacher'}"
-        name_field = f"{'student' if user_type == 'student' else 'teacher'}_name"
-        
-        response = await self.client.post(
-            f"{self.data_url}{endpoint}",
-            json={name_field: name},
-            headers={"Internal-Token": self.internal_token}
-        )
-        
-        if response.status_code not in [200, 201, 400]:  # 400 if already exists
-            print(f"Failed to add {username} to data node")
-            return False
-        
         return True
 
 
@@ -190,8 +389,8 @@ async def main():
     
     args = parser.parse_args()
     
-    # Get admin token
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(limits=IMPORT_LIMITS, timeout=IMPORT_TIMEOUT) as client:
+        # Get admin token
         response = await client.post(
             f"{args.auth_url}/login/admin",
             json={"username": args.admin_user, "password": args.admin_pass}
@@ -202,15 +401,15 @@ async def main():
             sys.exit(1)
         
         admin_token = response.json()["access_token"]
-    
-    # Import users
-    async with UserImporter(args.auth_url, args.data_url, args.internal_token) as importer:
-        results = await importer.import_from_csv(
-            Path(args.csv_file),
-            admin_token,
-            args.type,
-            args.generate_passwords
-        )
+        
+        # Import users over the same connection pool
+        async with UserImporter(args.auth_url, args.data_url, args.internal_token, client=client) as importer:
+            results = await importer.import_from_csv(
+                Path(args.csv_file),
+                admin_token,
+                args.type,
+                args.generate_passwords
+            )
     
     # Print results
     print(f"\n{'='*60}")
@@ -1,8 +1,8 @@
 """Common database utilities"""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, literal, select, union_all
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, Set
 import os
 
 
@@ -13,11 +13,24 @@ def get_database_url(db_name: str = "course_data.db") -> str:
 
 def create_db_engine(database_url: str):
     """Create a database engine"""
-    return create_engine(
+    engine = create_engine(
         database_url,
         connect_args={"check_same_thread": False} if "sqlite" in database_url else {},
         pool_pre_ping=True,
+        # Room for every distinct statement the services issue, so hot queries
+        # never fall out of the compiled-SQL cache (SQLAlchemy default: 500)
+        query_cache_size=2000,
     )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use write-ahead logging, so readers and the writer don't block each other"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
 
 
 def create_session_factory(engine):
@@ -39,6 +52,41 @@ def get_db_session(SessionLocal) -> Generator[Session, None, None]:
         db.close()
 
 
+def existing_values(db: Session, model, **values) -> Set[str]:
+    """Check several columns for an existing value in one query.
+
+    Each keyword names a column of model and the value to look for; None
+    values are skipped. Returns the names of the columns where some row
+    already has that value.
+    """
+    probes = [
+        select(literal(name)).where(getattr(model, name) == value)
+        for name, value in values.items()
+        if value is not None
+    ]
+    if not probes:
+        return set()
+    return set(db.execute(union_all(*probes)).scalars())
+
+
 def init_database(engine, Base):
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    """Initialize database tables.
+
+    The schema is inspected once up front, so starting against an existing,
+    up-to-date database costs one table listing plus one index listing per
+    table rather than an existence check per table and per index.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing_tables = [table for table in Base.metadata.sorted_tables if table.name not in existing_tables]
+    if missing_tables:
+        Base.metadata.create_all(bind=engine, tables=missing_tables)
+
+    # Tables that already existed may predate indexes declared since
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables or not table.indexes:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine)
@@ -5,10 +5,13 @@ WARNING: This tool bypasses all application logic and constraints.
 """
 import click
 import asyncio
-from sqlalchemy import inspect, MetaData, Table, select, update, delete, insert
+from sqlalchemy import inspect, func, text, MetaData, Table, select, update, delete, insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from tabulate import tabulate
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from itertools import chain
 import json
 from pathlib import Path
 
@@ -35,6 +38,50 @@ DATABASES = {
     }
 }
 
+# Rows fetched from the database at a time when streaming results
+STREAM_BATCH_SIZE = 1000
+
+
+@lru_cache(maxsize=None)
+def get_engine(db_path: str):
+    """Engine for the SQLite file at db_path, created once per process"""
+    return create_db_engine(f'sqlite:///{db_path}')
+
+
+@lru_cache(maxsize=None)
+def get_session_factory(db_path: str):
+    """Session factory bound to get_engine(db_path)"""
+    return create_session_factory(get_engine(db_path))
+
+
+@lru_cache(maxsize=None)
+def get_metadata(db_path: str) -> MetaData:
+    """MetaData collecting the tables reflected from db_path so far"""
+    return MetaData()
+
+
+def get_table(db_path: str, table: str) -> Optional[Table]:
+    """Reflected table from db_path, or None if there is no such table.
+    
+    Only the requested table is reflected, once per process.
+    """
+    metadata = get_metadata(db_path)
+    if table not in metadata.tables:
+        engine = get_engine(db_path)
+        if not inspect(engine).has_table(table):
+            return None
+        metadata.reflect(bind=engine, only=[table])
+    return metadata.tables[table]
+
+
+def echo_json_array(rows):
+    """Print rows (mappings) as an indented JSON array, one row at a time"""
+    separator = '[\n  '
+    for row in rows:
+        click.echo(separator + json.dumps(dict(row), indent=2, default=str).replace('\n', '\n  '), nl=False)
+        separator = ',\n  '
+    click.echo('[]' if separator == '[\n  ' else '\n]')
+
 
 @click.group()
 def db_edit():
@@ -52,8 +99,7 @@ def list_tables(database):
         click.echo(click.style(f'✗ Database not found: {db_path}', fg='red'))
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    inspector = inspect(engine)
+    inspector = inspect(get_engine(db_path))
     tables = inspector.get_table_names()
     
     if not tables:
@@ -83,38 +129,26 @@ def query(database, table, limit, format):
         click.echo(click.style(f'✗ Database not found: {db_path}', fg='red'))
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    SessionLocal = create_session_factory(engine)
+    table_obj = get_table(db_path, table)
+    if table_obj is None:
+        click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
+        return
     
-    with get_db_session(SessionLocal) as session:
-        # Use SQLAlchemy core for generic table access
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        if table not in metadata.tables:
-            click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
-            return
-        
-        table_obj = metadata.tables[table]
-        stmt = select(table_obj).limit(limit)
-        result = session.execute(stmt)
-        rows = result.fetchall()
-        
-        if not rows:
+    with get_db_session(get_session_factory(db_path)) as session:
+        total = session.execute(select(func.count()).select_from(table_obj)).scalar()
+        if not total or limit <= 0:
             click.echo(click.style('No records found', fg='yellow'))
             return
         
-        # Convert to dict
-        columns = [col.name for col in table_obj.columns]
-        data = []
-        for row in rows:
-            data.append(dict(zip(columns, row)))
+        # Rows are streamed from the database rather than fetched all at once
+        stmt = select(table_obj).limit(limit).execution_options(yield_per=STREAM_BATCH_SIZE)
+        rows = session.execute(stmt).mappings()
         
         if format == 'json':
-            click.echo(json.dumps(data, indent=2, default=str))
+            echo_json_array(rows)
         else:
-            click.echo(f'\n{click.style(f"Records from {table}:", bold=True)} (showing {len(data)} of {len(data)})\n')
-            click.echo(tabulate(data, headers='keys', tablefmt='grid'))
+            click.echo(f'\n{click.style(f"Records from {table}:", bold=True)} (showing {min(limit, total)} of {total})\n')
+            click.echo(tabulate(rows, headers='keys', tablefmt='grid'))
 
 
 @db_edit.command()
@@ -135,19 +169,12 @@ def insert_record(database, table, values):
         click.echo(click.style('✗ Invalid JSON format for values', fg='red'))
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    SessionLocal = create_session_factory(engine)
+    table_obj = get_table(db_path, table)
+    if table_obj is None:
+        click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
+        return
     
-    with get_db_session(SessionLocal) as session:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        if table not in metadata.tables:
-            click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
-            return
-        
-        table_obj = metadata.tables[table]
-        
+    with get_db_session(get_session_factory(db_path)) as session:
         try:
             stmt = insert(table_obj).values(**values_dict)
             result = session.execute(stmt)
@@ -184,19 +211,12 @@ def update_record(database, table, where, values):
         click.echo('Cancelled')
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    SessionLocal = create_session_factory(engine)
+    table_obj = get_table(db_path, table)
+    if table_obj is None:
+        click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
+        return
     
-    with get_db_session(SessionLocal) as session:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        if table not in metadata.tables:
-            click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
-            return
-        
-        table_obj = metadata.tables[table]
-        
+    with get_db_session(get_session_factory(db_path)) as session:
         try:
             # Build WHERE clause
             stmt = update(table_obj).values(**values_dict)
@@ -235,19 +255,12 @@ def delete_record(database, table, where):
         click.echo('Cancelled')
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    SessionLocal = create_session_factory(engine)
+    table_obj = get_table(db_path, table)
+    if table_obj is None:
+        click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
+        return
     
-    with get_db_session(SessionLocal) as session:
-        metadata = MetaData()
-        metadata.reflect(bind=engine)
-        
-        if table not in metadata.tables:
-            click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
-            return
-        
-        table_obj = metadata.tables[table]
-        
+    with get_db_session(get_session_factory(db_path)) as session:
         try:
             # Build WHERE clause
             stmt = delete(table_obj)
@@ -275,8 +288,7 @@ def column_info(database, table, column):
         click.echo(click.style(f'✗ Database not found: {db_path}', fg='red'))
         return
     
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    inspector = inspect(engine)
+    inspector = inspect(get_engine(db_path))
     
     if table not in inspector.get_table_names():
         click.echo(click.style(f'✗ Table not found: {table}', fg='red'))
@@ -301,42 +313,45 @@ def column_info(database, table, column):
 @click.option('--sql', '-s', required=True, help='Raw SQL query to execute')
 @click.option('--format', '-f', type=click.Choice(['table', 'json']), default='table', help='Output format')
 def raw_query(database, sql, format):
-    """Execute a raw SQL query (SELECT only for safety)"""
+    """Execute a raw SQL query (read-only for safety)"""
     db_path = DATABASES[database]['path']
     
     if not Path(db_path).exists():
         click.echo(click.style(f'✗ Database not found: {db_path}', fg='red'))
         return
     
-    # Safety check - only allow SELECT
-    if not sql.strip().upper().startswith('SELECT'):
-        click.echo(click.style('✗ Only SELECT queries are allowed for safety', fg='red'))
-        click.echo('Use specific commands (insert-record, update-record, delete-record) for modifications')
-        return
-    
-    engine = create_db_engine(f'sqlite:///{db_path}')
-    SessionLocal = create_session_factory(engine)
-    
-    with get_db_session(SessionLocal) as session:
+    with get_engine(db_path).connect() as conn:
+        # Safety check - SQLite itself rejects any write while query_only is
+        # on, however the statement is spelled (comments, CTEs, ...)
+        conn.exec_driver_sql('PRAGMA query_only = ON')
         try:
-            result = session.execute(sql)
-            rows = result.fetchall()
+            result = conn.execute(text(sql).execution_options(yield_per=STREAM_BATCH_SIZE))
+            if not result.returns_rows:
+                click.echo(click.style('✗ Only queries that return rows are allowed', fg='red'))
+                return
             
-            if not rows:
+            rows = result.mappings()
+            first = rows.fetchone()
+            if first is None:
                 click.echo(click.style('No results', fg='yellow'))
                 return
             
-            # Get column names
-            columns = result.keys()
-            data = [dict(zip(columns, row)) for row in rows]
-            
             if format == 'json':
-                click.echo(json.dumps(data, indent=2, default=str))
+                echo_json_array(chain([first], rows))
             else:
+                data = [first, *rows]
                 click.echo(f'\n{click.style("Query Results:", bold=True)} ({len(data)} rows)\n')
                 click.echo(tabulate(data, headers='keys', tablefmt='grid'))
+        except OperationalError as e:
+            click.echo(click.style(f'✗ Query failed: {e.orig}', fg='red'))
+            if 'readonly' in str(e.orig):
+                click.echo('Use specific commands (insert-record, update-record, delete-record) for modifications')
         except Exception as e:
             click.echo(click.style(f'✗ Query failed: {str(e)}', fg='red'))
+        finally:
+            # The connection goes back to the cached engine's pool
+            conn.rollback()
+            conn.exec_driver_sql('PRAGMA query_only = OFF')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+"""ASGI middleware shared by the service nodes"""
+from typing import Iterable
+
+from fastapi import HTTPException
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .responses import ORJSONResponse
+from .utils import decode_access_token, strip_bearer
+
+
+class JWTMiddleware:
+    """Decode the bearer access token once for requests under the given path prefixes.
+
+    The token payload is stored as request.state.user for the route to use.
+    Requests without a valid access token are answered with a 401 here and
+    never reach the route. Other paths pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, prefixes: Iterable[str] = ("/user/",)):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith(self.prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        authorization = ""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
+        try:
+            payload = decode_access_token(strip_bearer(authorization))
+        except HTTPException as e:
+            response = ORJSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["user"] = payload
+        await self.app(scope, receive, send)
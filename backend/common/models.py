@@ -95,7 +95,7 @@ class Student(AuthBase):
     totp_secret = Column(String(32))  # For 2FA (required for students)
     has_2fa = Column(Boolean, default=False)  # Track if student has enabled 2FA
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)  # Listing order
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
 
@@ -109,7 +109,7 @@ class Teacher(AuthBase):
     totp_secret = Column(String(32))  # For 2FA (optional for teachers)
     has_2fa = Column(Boolean, default=False)  # Track if teacher has enabled 2FA
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)  # Listing order
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
 
@@ -120,7 +120,7 @@ class Admin(AuthBase):
     admin_id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String(100), nullable=False, unique=True)
     password_hash = Column(String(255), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)  # Listing order
 
 
 class RefreshToken(AuthBase):
@@ -128,13 +128,27 @@ class RefreshToken(AuthBase):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)  # Revoked per user on every login
     token_hash = Column(String(255), nullable=False, unique=True)
     expires_at = Column(DateTime, nullable=False)
     is_revoked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 
+class PendingDataNodeOp(AuthBase):
+    """Data node write queued in the same transaction as the auth change it follows"""
+    __tablename__ = "pending_data_node_ops"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(100), nullable=False)  # data node endpoint, e.g. /add/student
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), default="pending")  # pending, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(String(500))
+    next_attempt_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
 class RegistrationCode(AuthBase):
     """Registration codes generated by admin"""
     __tablename__ = "registration_codes"
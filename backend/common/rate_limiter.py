@@ -97,6 +97,19 @@ class RateLimiter:
                 del self.buckets[key]
 
 
+def client_ip_from_headers(request_headers: Dict[str, str]) -> str:
+    """Originating client IP from request headers, honouring X-Forwarded-For
+
+    The only place that trusts client-supplied forwarding headers; both the
+    rate limiters and utils.get_client_ip go through it.
+    """
+    forwarded_for = request_headers.get("x-forwarded-for", "")
+    if forwarded_for:
+        # Take the first IP in the chain
+        return forwarded_for.split(",")[0].strip()
+    return request_headers.get("x-real-ip") or "unknown"
+
+
 class IPRateLimiter:
     """Rate limiter with IP-based tracking and X-Forwarded-For support"""
 
@@ -105,14 +118,7 @@ class IPRateLimiter:
 
     def get_client_ip(self, request_headers: Dict[str, str]) -> str:
         """Extract client IP from headers, supporting X-Forwarded-For"""
-        # Check X-Forwarded-For header
-        forwarded_for = request_headers.get("x-forwarded-for", "")
-        if forwarded_for:
-            # Take the first IP in the chain
-            return forwarded_for.split(",")[0].strip()
-        
-        # Fallback to direct connection IP
-        return request_headers.get("x-real-ip", "unknown")
+        return client_ip_from_headers(request_headers)
 
     def check_rate_limit(
         self, 
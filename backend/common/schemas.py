@@ -1,6 +1,6 @@
 """Pydantic schemas for API validation"""
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_validator
+from typing import Annotated, Optional, List
 from datetime import datetime
 
 
@@ -48,8 +48,7 @@ class CourseResponse(CourseBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Student schemas
@@ -67,8 +66,7 @@ class StudentResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Teacher schemas
@@ -84,25 +82,43 @@ class TeacherResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # User schemas
+Username = Annotated[str, StringConstraints(min_length=3, max_length=100)]
+Password = Annotated[str, StringConstraints(min_length=6, max_length=128)]
+TOTPCode = Annotated[str, StringConstraints(pattern=r"^[0-9]{6}$")]
+
+
 class UserCreate(BaseModel):
-    username: str = Field(..., min_length=3, max_length=100)
-    password: str = Field(..., min_length=6)
-    user_type: str = Field(..., pattern="^(student|teacher)$")  # Exclude admin from registration
-    registration_code: Optional[str] = None
+    model_config = ConfigDict(extra="forbid")
+
+    username: Username
+    password: Password
+    user_type: Annotated[str, StringConstraints(pattern="^(student|teacher)$")]  # Exclude admin from registration
+    registration_code: Optional[Annotated[str, StringConstraints(max_length=64)]] = None
 
 
 class UserLogin(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_max_length=128)
+
     username: str
     password: str
 
 
 class User2FA(BaseModel):
-    totp_code: str = Field(..., pattern="^[0-9]{6}$")
+    model_config = ConfigDict(extra="forbid")
+
+    totp_code: TOTPCode
+
+
+class TOTPSetup(BaseModel):
+    """Phase 2 of 2FA setup: the secret from phase 1 plus a code generated from it"""
+    model_config = ConfigDict(extra="forbid")
+
+    totp_secret: Annotated[str, StringConstraints(pattern=r"^[A-Z2-7]{16,32}$")]
+    totp_code: TOTPCode
 
 
 class UserResponse(BaseModel):
@@ -113,8 +129,7 @@ class UserResponse(BaseModel):
     has_2fa: bool = False
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class AdminResponse(BaseModel):
@@ -124,8 +139,7 @@ class AdminResponse(BaseModel):
     is_active: bool = True  # Admins are always active
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Token schemas
@@ -252,12 +266,16 @@ class QueueTaskStatus(BaseModel):
 
 # System Settings
 class SystemSettingsResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     student_registration_enabled: bool
     teacher_registration_enabled: bool
     updated_at: datetime
 
 
 class SystemSettingsUpdate(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
     student_registration_enabled: Optional[bool] = None
     teacher_registration_enabled: Optional[bool] = None
 
@@ -1,21 +1,55 @@
 """Common security utilities for authentication and authorization"""
-from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
-from jose import JWTError, jwt
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import quote
+from jose import JWTError, jwk, jwt
 from passlib.context import CryptContext
-import pyotp
 import secrets
 import hashlib
+import hmac
+import base64
+import binascii
+import struct
+import time
+import asyncio
 import os
 
 # Debug mode flag - disables password encryption when true (FOR DEBUGGING ONLY!)
 DEBUG_MODE = os.getenv("DEBUG_MODE", "false").lower() in ("true", "1", "yes")
 
 # Password hashing
-# Prefer pbkdf2_sha256 which doesn't rely on the native bcrypt C extension
-# (avoids issues with broken bcrypt installs). Keep bcrypt_sha256/bcrypt as
-# fallbacks for compatibility.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"], deprecated="auto")
+# Prefer argon2id through argon2-cffi, which binds the native libargon2 (its
+# optimised SIMD code path) instead of a pure-Python implementation. If that
+# extension is missing, fall back to pbkdf2_sha256 which doesn't rely on the
+# native bcrypt C extension (avoids issues with broken bcrypt installs).
+# Existing pbkdf2_sha256/bcrypt_sha256/bcrypt hashes keep verifying.
+try:
+    import argon2  # noqa: F401
+    ARGON2_AVAILABLE = True
+except ImportError:
+    ARGON2_AVAILABLE = False
+
+_PASSWORD_SCHEMES = ["pbkdf2_sha256", "bcrypt_sha256", "bcrypt"]
+# Argon2 cost, tuned per machine with `course-cli bench-hash`; unset values
+# keep passlib's defaults. Existing hashes still verify at their own cost.
+_ARGON2_SETTINGS = {}
+if ARGON2_AVAILABLE:
+    _PASSWORD_SCHEMES.insert(0, "argon2")
+    for _setting, _env in (
+        ("time_cost", "ARGON2_TIME_COST"),
+        ("memory_cost", "ARGON2_MEMORY_COST"),  # KiB
+        ("parallelism", "ARGON2_PARALLELISM"),
+    ):
+        if os.getenv(_env):
+            _ARGON2_SETTINGS[f"argon2__{_setting}"] = int(os.environ[_env])
+pwd_context = CryptContext(schemes=_PASSWORD_SCHEMES, deprecated="auto", **_ARGON2_SETTINGS)
+
+# Password KDFs are CPU- and memory-hard. The async wrappers below run them on
+# this pool (the C backends release the GIL) so they don't block the event
+# loop; one worker per core bounds the memory used by concurrent hashes.
+_kdf_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="kdf")
 
 # JWT configuration
 # CRITICAL: Change SECRET_KEY in production via environment variable
@@ -23,6 +57,17 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_EXPIRE_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+# Construct the HMAC signing key once; jose accepts Key objects directly and
+# otherwise re-parses the raw secret on every encode/decode.
+_JWT_KEY = jwk.construct(SECRET_KEY, ALGORITHM)
+
+# TOTP configuration (RFC 6238 defaults, matching pyotp and authenticator apps)
+TOTP_INTERVAL = 30
+TOTP_DIGITS = 6
+TOTP_VALID_WINDOW = 1
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -48,6 +93,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(pw)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password run on the KDF worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_kdf_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash run on the KDF worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_kdf_executor, get_password_hash, password)
+
+
 def _normalize_password(password: str) -> str:
     """Ensure the password length is compatible with bcrypt backends.
 
@@ -57,62 +114,110 @@ def _normalize_password(password: str) -> str:
     """
     if not isinstance(password, (bytes, str)):
         password = str(password)
-    pw_bytes = password.encode() if isinstance(password, str) else password
+    if isinstance(password, str):
+        # An ASCII string's length is its UTF-8 byte length, so the common
+        # short ASCII password needs no encoded copy just to be measured
+        if password.isascii() and len(password) <= 72:
+            return password
+        pw_bytes = password.encode()
+    else:
+        pw_bytes = password
     if len(pw_bytes) > 72:
         return hashlib.sha256(pw_bytes).hexdigest()
     return password
 
 
+def _encode_token(data: Dict[str, Any], lifetime_seconds: float, token_type: str) -> str:
+    """Sign a JWT of the given type expiring lifetime_seconds from now"""
+    to_encode = data.copy()
+    to_encode.update({"exp": int(time.time() + lifetime_seconds), "type": token_type})
+    return jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM)
+
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    lifetime = expires_delta.total_seconds() if expires_delta else ACCESS_TOKEN_EXPIRE_SECONDS
+    return _encode_token(data, lifetime, "access")
 
 
 def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT refresh token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    lifetime = expires_delta.total_seconds() if expires_delta else REFRESH_TOKEN_EXPIRE_SECONDS
+    return _encode_token(data, lifetime, "refresh")
 
 
 def decode_token(token: str) -> Optional[Dict[str, Any]]:
     """Decode and verify a JWT token"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, _JWT_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
 
 
 def generate_totp_secret() -> str:
-    """Generate a TOTP secret for 2FA"""
-    return pyotp.random_base32()
+    """Generate a TOTP secret for 2FA (160 random bits, 32 base32 characters like pyotp.random_base32)"""
+    return base64.b32encode(secrets.token_bytes(20)).decode()
+
+
+@lru_cache(maxsize=4096)
+def _totp_key(secret: str) -> bytes:
+    """Decode a base32 TOTP secret to raw key bytes (cached per secret)"""
+    missing_padding = len(secret) % 8
+    if missing_padding:
+        secret += "=" * (8 - missing_padding)
+    return base64.b32decode(secret, casefold=True)
+
+
+@lru_cache(maxsize=8192)
+def _totp_code(key: bytes, counter: int) -> bytes:
+    """Compute the TOTP code for a time counter (RFC 4226 dynamic truncation).
+
+    Cached per (key, counter), so repeated checks against the same window,
+    e.g. a retried login or the neighbouring windows, reuse the HMAC.
+    """
+    digest = hmac.new(key, struct.pack(">Q", counter), hashlib.sha1).digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack(">I", digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(value % 10 ** TOTP_DIGITS).zfill(TOTP_DIGITS).encode()
 
 
 def verify_totp(secret: str, code: str) -> bool:
-    """Verify a TOTP code"""
-    totp = pyotp.TOTP(secret)
-    return totp.verify(code, valid_window=1)
+    """Verify a TOTP code against the current window and its neighbours.
+
+    The current window is tried first, so a client with an accurate clock
+    costs one HMAC; the neighbouring windows are only computed on a miss.
+    Each comparison uses hmac.compare_digest.
+    """
+    if not secret or not code:
+        return False
+    try:
+        key = _totp_key(secret)
+    except (binascii.Error, ValueError):
+        return False
+
+    code_bytes = str(code).encode()
+    counter = int(time.time()) // TOTP_INTERVAL
+    if hmac.compare_digest(_totp_code(key, counter), code_bytes):
+        return True
+    # Clock skew: fall back to the neighbouring windows
+    matched = False
+    for offset in range(1, TOTP_VALID_WINDOW + 1):
+        matched |= hmac.compare_digest(_totp_code(key, counter - offset), code_bytes)
+        matched |= hmac.compare_digest(_totp_code(key, counter + offset), code_bytes)
+    return matched
+
+
+@lru_cache(maxsize=16)
+def _totp_uri_affixes(issuer: str) -> Tuple[str, str]:
+    """URL-encoded issuer parts of a provisioning URI (cached per issuer)"""
+    return f"otpauth://totp/{quote(issuer)}:", f"&issuer={quote(issuer, safe='')}"
 
 
 def get_totp_uri(secret: str, username: str, issuer: str = "Course Selection") -> str:
-    """Get TOTP provisioning URI for QR code"""
-    totp = pyotp.TOTP(secret)
-    return totp.provisioning_uri(name=username, issuer_name=issuer)
+    """Get TOTP provisioning URI for QR code (same format as pyotp's provisioning_uri)"""
+    prefix, suffix = _totp_uri_affixes(issuer)
+    return "".join((prefix, quote(username), "?secret=", secret, suffix))
 
 
 def generate_registration_code() -> str:
@@ -1,11 +1,12 @@
 """
 Random user generator for testing and demo purposes.
 """
+import argparse
 import random
 import string
 import csv
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import secrets
 
 
@@ -114,10 +115,8 @@ class UserGenerator:
         print(f"Generated {len(users)} users and saved to {output_path}")
 
 
-def main():
-    """CLI for random user generation"""
-    import argparse
-    
+def _build_parser() -> argparse.ArgumentParser:
+    """Argument parser for the user generation CLI"""
     parser = argparse.ArgumentParser(description="Generate random users")
     parser.add_argument("count", type=int, help="Number of users to generate")
     parser.add_argument("--type", choices=["student", "teacher"], default="student",
@@ -125,8 +124,16 @@ def main():
     parser.add_argument("--output", required=True, help="Output CSV file")
     parser.add_argument("--no-passwords", action="store_true",
                        help="Don't generate passwords")
-    
-    args = parser.parse_args()
+    return parser
+
+
+# Built once at import, so repeated main() calls only parse
+_PARSER = _build_parser()
+
+
+def main(argv: Optional[List[str]] = None):
+    """CLI for random user generation"""
+    args = _PARSER.parse_args(argv)
     
     # Generate users
     users = UserGenerator.generate_users(
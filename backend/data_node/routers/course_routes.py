@@ -1,5 +1,6 @@
 """Course management routes for Data Node"""
 from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional, Callable
 from datetime import datetime, timezone
@@ -9,6 +10,9 @@ from backend.common import (
     CourseCreate, CourseUpdate, CourseResponse,
 )
 
+# Rows fetched per batch when scanning a whole table
+SCAN_BATCH_SIZE = 500
+
 
 def create_course_router(get_db: Callable, verify_internal_token: Callable) -> APIRouter:
     """
@@ -202,12 +206,17 @@ def create_course_router(get_db: Callable, verify_internal_token: Callable) -> A
         teacher_id: Optional[int] = None,
         course_type: Optional[str] = None,
         search: Optional[str] = None,
+        student_id: Optional[int] = None,
         page: int = 1,
         page_size: int = 20,
         db: Session = Depends(get_db),
         _: None = Depends(verify_internal_token)
     ):
-        """Get list of courses with optional filters"""
+        """Get list of courses with optional filters.
+        
+        With student_id, only courses the student is eligible for are listed:
+        courses without tags, or whose tags the student all has.
+        """
         query = db.query(Course)
         
         if teacher_id:
@@ -225,12 +234,36 @@ def create_course_router(get_db: Callable, verify_internal_token: Callable) -> A
                 (Course.course_notes.ilike(search_pattern))
             )
         
-        # Get total count before pagination
-        total = query.count()
-        
-        # Apply pagination
         offset = (page - 1) * page_size
-        courses = query.offset(offset).limit(page_size).all()
+        if student_id is not None:
+            student_tags = db.execute(
+                select(StudentCourseData.student_tags).where(StudentCourseData.student_id == student_id)
+            ).first()
+            if student_tags is None:
+                raise HTTPException(status_code=404, detail="Student not found")
+            student_tags = set(student_tags[0] or [])
+            
+            # Tags are JSON lists, so match them on a column-only scan and
+            # load full rows for the requested page only
+            eligible = [
+                course_id
+                for course_id, course_tags in query.order_by(Course.course_id)
+                .with_entities(Course.course_id, Course.course_tags)
+                .execution_options(yield_per=SCAN_BATCH_SIZE)
+                if not course_tags or student_tags.issuperset(course_tags)
+            ]
+            total = len(eligible)
+            page_ids = eligible[offset:offset + page_size]
+            courses = (
+                db.query(Course).filter(Course.course_id.in_(page_ids)).order_by(Course.course_id).all()
+                if page_ids else []
+            )
+        else:
+            # Get total count before pagination
+            total = query.count()
+            
+            # Apply pagination
+            courses = query.offset(offset).limit(page_size).all()
         
         result = []
         for course in courses:
@@ -247,17 +280,21 @@ def create_course_router(get_db: Callable, verify_internal_token: Callable) -> A
         _: None = Depends(verify_internal_token)
     ):
         """Get list of students enrolled in a specific course"""
-        # Get all students
-        students = db.query(StudentCourseData).all()
+        # Scan only the needed columns, a batch at a time, instead of
+        # loading every student object at once
+        students = db.execute(
+            select(StudentCourseData.student_id, StudentCourseData.student_name, StudentCourseData.student_courses)
+            .execution_options(yield_per=SCAN_BATCH_SIZE)
+        )
         
         # Filter students who have selected this course
         enrolled_students = []
-        for student in students:
-            if course_id in student.student_courses:
+        for student_id, student_name, student_courses in students:
+            if student_courses and course_id in student_courses:
                 enrolled_students.append({
-                    "student_id": student.student_id,
-                    "name": student.student_name,
-                    "user_id": student.student_id
+                    "student_id": student_id,
+                    "name": student_name,
+                    "user_id": student_id
                 })
         
         return {
@@ -1,15 +1,23 @@
 """Student management routes for Data Node"""
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Query
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
-from typing import List, Optional, Callable
+from typing import Dict, List, Optional, Callable
 from datetime import datetime, timezone
 
 from backend.common import (
     Course, StudentCourseData, AvailableTag,
     StudentCreate, StudentResponse,
+    existing_values,
 )
 
+# Upper bound on IDs accepted by /get/students
+MAX_BATCH_STUDENT_IDS = 1000
+
+# Upper bound on renames accepted by /bulk/rename/students
+MAX_BULK_STUDENT_RENAMES = 1000
+
 
 def create_student_router(get_db: Callable, verify_internal_token: Callable) -> APIRouter:
     """
@@ -31,14 +39,22 @@ def create_student_router(get_db: Callable, verify_internal_token: Callable) ->
         _: None = Depends(verify_internal_token)
     ):
         """Add a new student"""
-        # Check if student already exists by ID or name
-        if student.student_id:
-            existing = db.query(StudentCourseData).filter(StudentCourseData.student_id == student.student_id).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Student with this ID already exists")
-        
-        existing_name = db.query(StudentCourseData).filter(StudentCourseData.student_name == student.student_name).first()
-        if existing_name:
+        # Check if student already exists by ID or name, in one query
+        taken = existing_values(
+            db, StudentCourseData, student_id=student.student_id or None, student_name=student.student_name
+        )
+        if taken == {"student_id", "student_name"}:
+            # A retried create (e.g. after a timeout) of a record that was stored
+            same = db.execute(
+                select(StudentCourseData.__table__).where(
+                    StudentCourseData.student_id == student.student_id, StudentCourseData.student_name == student.student_name
+                )
+            ).mappings().first()
+            if same is not None:
+                return same
+        if "student_id" in taken:
+            raise HTTPException(status_code=400, detail="Student with this ID already exists")
+        if "student_name" in taken:
             raise HTTPException(status_code=400, detail="Student with this name already exists")
 
         # Create student with explicit ID if provided (for auth sync)
@@ -50,10 +66,12 @@ def create_student_router(get_db: Callable, verify_internal_token: Callable) ->
         if student.student_id:
             student_data["student_id"] = student.student_id
         
-        db_student = StudentCourseData(**student_data)
-        db.add(db_student)
+        # RETURNING hands back the stored row (ID, timestamps), so no
+        # refresh SELECT is needed after the commit
+        db_student = db.execute(
+            insert(StudentCourseData).values(**student_data).returning(*StudentCourseData.__table__.c)
+        ).mappings().one()
         db.commit()
-        db.refresh(db_student)
         return db_student
 
     @router.post("/update/student", response_model=StudentResponse)
@@ -90,6 +108,54 @@ def create_student_router(get_db: Callable, verify_internal_token: Callable) ->
         db.refresh(db_student)
         return db_student
 
+    @router.post("/bulk/rename/students")
+    async def bulk_rename_students(
+        renames: Dict[str, str] = Body(...),
+        db: Session = Depends(get_db),
+        _: None = Depends(verify_internal_token)
+    ):
+        """Rename several students in one transaction, given {current name: new name}
+
+        Unknown or clashing names are reported per name and skipped.
+        """
+        if len(renames) > MAX_BULK_STUDENT_RENAMES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_BULK_STUDENT_RENAMES} renames per request"
+            )
+        renames = {old: new for old, new in renames.items() if old != new}
+        name_column = StudentCourseData.student_name
+        
+        # The rows to rename and the new names already in use, one query each
+        students = {
+            row.student_name: row
+            for row in db.query(StudentCourseData).filter(name_column.in_(renames.keys())).all()
+        }
+        taken = set(db.execute(
+            select(name_column).where(name_column.in_(renames.values()))
+        ).scalars())
+        
+        errors = {}
+        now = datetime.now(timezone.utc)
+        for old, new in renames.items():
+            db_student = students.get(old)
+            if db_student is None:
+                errors[old] = "Student not found"
+            elif new in taken:
+                errors[old] = "Student with this name already exists"
+            else:
+                db_student.student_name = new
+                db_student.updated_at = now
+                taken.discard(old)
+                taken.add(new)
+        db.commit()
+        
+        return {
+            "success": True,
+            "renamed_count": len(renames) - len(errors),
+            "errors": errors
+        }
+
     @router.post("/delete/student")
     async def delete_student(
         student_id: int,
@@ -128,4 +194,18 @@ def create_student_router(get_db: Callable, verify_internal_token: Callable) ->
             raise HTTPException(status_code=404, detail="Student not found")
         return db_student
 
+    @router.get("/get/students", response_model=List[StudentResponse])
+    async def get_students(
+        student_ids: List[int] = Query(...),
+        db: Session = Depends(get_db),
+        _: None = Depends(verify_internal_token)
+    ):
+        """Get several students in one call (unknown IDs are skipped)"""
+        if len(student_ids) > MAX_BATCH_STUDENT_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_BATCH_STUDENT_IDS} student_ids per request"
+            )
+        return db.query(StudentCourseData).filter(StudentCourseData.student_id.in_(student_ids)).all()
+
     return router
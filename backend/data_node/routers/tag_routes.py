@@ -1,5 +1,6 @@
 """Tag management routes for Data Node"""
 from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Optional, Callable
 from datetime import datetime, timezone
@@ -8,6 +9,9 @@ from backend.common import (
     Course, StudentCourseData, AvailableTag,
 )
 
+# Rows fetched per batch when scanning a whole table
+SCAN_BATCH_SIZE = 500
+
 
 def create_tag_router(get_db: Callable, verify_internal_token: Callable) -> APIRouter:
     """
@@ -83,19 +87,21 @@ def create_tag_router(get_db: Callable, verify_internal_token: Callable) -> APIR
         _: None = Depends(verify_internal_token)
     ):
         """Sync available tags from existing courses and students"""
-        # Get all unique tags from courses
-        courses = db.query(Course).all()
+        # Get all unique tags from courses, streaming just the tag column
         course_tags = set()
-        for course in courses:
-            if course.course_tags:
-                course_tags.update(course.course_tags)
+        for tags in db.execute(
+            select(Course.course_tags).execution_options(yield_per=SCAN_BATCH_SIZE)
+        ).scalars():
+            if tags:
+                course_tags.update(tags)
         
         # Get all unique tags from students
-        students = db.query(StudentCourseData).all()
         student_tags = set()
-        for student in students:
-            if student.student_tags:
-                student_tags.update(student.student_tags)
+        for tags in db.execute(
+            select(StudentCourseData.student_tags).execution_options(yield_per=SCAN_BATCH_SIZE)
+        ).scalars():
+            if tags:
+                student_tags.update(tags)
         
         # Add or update course tags
         for tag_name in course_tags:
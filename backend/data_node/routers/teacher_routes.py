@@ -1,14 +1,19 @@
 """Teacher management routes for Data Node"""
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Body
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from typing import Callable
+from typing import Callable, Dict
 from datetime import datetime, timezone
 
 from backend.common import (
     TeacherCourseData,
     TeacherCreate, TeacherResponse,
+    existing_values,
 )
 
+# Upper bound on renames accepted by /bulk/rename/teachers
+MAX_BULK_TEACHER_RENAMES = 1000
+
 
 def create_teacher_router(get_db: Callable, verify_internal_token: Callable) -> APIRouter:
     """
@@ -30,14 +35,22 @@ def create_teacher_router(get_db: Callable, verify_internal_token: Callable) ->
         _: None = Depends(verify_internal_token)
     ):
         """Add a new teacher"""
-        # Check if teacher already exists by ID or name
-        if teacher.teacher_id:
-            existing = db.query(TeacherCourseData).filter(TeacherCourseData.teacher_id == teacher.teacher_id).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Teacher with this ID already exists")
-        
-        existing_name = db.query(TeacherCourseData).filter(TeacherCourseData.teacher_name == teacher.teacher_name).first()
-        if existing_name:
+        # Check if teacher already exists by ID or name, in one query
+        taken = existing_values(
+            db, TeacherCourseData, teacher_id=teacher.teacher_id or None, teacher_name=teacher.teacher_name
+        )
+        if taken == {"teacher_id", "teacher_name"}:
+            # A retried create (e.g. after a timeout) of a record that was stored
+            same = db.execute(
+                select(TeacherCourseData.__table__).where(
+                    TeacherCourseData.teacher_id == teacher.teacher_id, TeacherCourseData.teacher_name == teacher.teacher_name
+                )
+            ).mappings().first()
+            if same is not None:
+                return same
+        if "teacher_id" in taken:
+            raise HTTPException(status_code=400, detail="Teacher with this ID already exists")
+        if "teacher_name" in taken:
             raise HTTPException(status_code=400, detail="Teacher with this name already exists")
 
         # Create teacher with explicit ID if provided (for auth sync)
@@ -48,10 +61,12 @@ def create_teacher_router(get_db: Callable, verify_internal_token: Callable) ->
         if teacher.teacher_id:
             teacher_data["teacher_id"] = teacher.teacher_id
         
-        db_teacher = TeacherCourseData(**teacher_data)
-        db.add(db_teacher)
+        # RETURNING hands back the stored row (ID, timestamps), so no
+        # refresh SELECT is needed after the commit
+        db_teacher = db.execute(
+            insert(TeacherCourseData).values(**teacher_data).returning(*TeacherCourseData.__table__.c)
+        ).mappings().one()
         db.commit()
-        db.refresh(db_teacher)
         return db_teacher
 
     @router.post("/update/teacher", response_model=TeacherResponse)
@@ -72,6 +87,54 @@ def create_teacher_router(get_db: Callable, verify_internal_token: Callable) ->
         db.refresh(db_teacher)
         return db_teacher
 
+    @router.post("/bulk/rename/teachers")
+    async def bulk_rename_teachers(
+        renames: Dict[str, str] = Body(...),
+        db: Session = Depends(get_db),
+        _: None = Depends(verify_internal_token)
+    ):
+        """Rename several teachers in one transaction, given {current name: new name}
+
+        Unknown or clashing names are reported per name and skipped.
+        """
+        if len(renames) > MAX_BULK_TEACHER_RENAMES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {MAX_BULK_TEACHER_RENAMES} renames per request"
+            )
+        renames = {old: new for old, new in renames.items() if old != new}
+        name_column = TeacherCourseData.teacher_name
+        
+        # The rows to rename and the new names already in use, one query each
+        teachers = {
+            row.teacher_name: row
+            for row in db.query(TeacherCourseData).filter(name_column.in_(renames.keys())).all()
+        }
+        taken = set(db.execute(
+            select(name_column).where(name_column.in_(renames.values()))
+        ).scalars())
+        
+        errors = {}
+        now = datetime.now(timezone.utc)
+        for old, new in renames.items():
+            db_teacher = teachers.get(old)
+            if db_teacher is None:
+                errors[old] = "Teacher not found"
+            elif new in taken:
+                errors[old] = "Teacher with this name already exists"
+            else:
+                db_teacher.teacher_name = new
+                db_teacher.updated_at = now
+                taken.discard(old)
+                taken.add(new)
+        db.commit()
+        
+        return {
+            "success": True,
+            "renamed_count": len(renames) - len(errors),
+            "errors": errors
+        }
+
     @router.post("/delete/teacher")
     async def delete_teacher(
         teacher_id: int,
@@ -1,8 +1,11 @@
 """Student Service Node - Student course selection and management"""
 from fastapi import FastAPI, HTTPException, Depends, Header, status, Request
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
+import asyncio
 import os
+from urllib.parse import urlencode
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -13,8 +16,8 @@ load_dotenv(dotenv_path=Path(__file__).with_name('.env'), override=True)
 from backend.common import (
     CourseSelectionRequest,
     get_current_user_from_token, verify_user_type,
-    call_service_api, get_request_headers, api_limiter,
-    create_socket_server_config, SocketClient,
+    call_service_api, close_service_client, get_request_headers, api_limiter,
+    create_socket_server_config, SocketClient, SingleFlight,
 )
 
 # Configuration
@@ -24,8 +27,50 @@ QUEUE_NODE_URL = os.getenv("QUEUE_NODE_URL", "http://localhost:8005")
 INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
 PORT = int(os.getenv("PORT", "8004"))
 
+# course_schedule day names -> weekday numbers (1=Monday, 7=Sunday)
+WEEKDAY_NUMBERS = {
+    "monday": 1, "tuesday": 2, "wednesday": 3, "thursday": 4,
+    "friday": 5, "saturday": 6, "sunday": 7
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the pooled client used for calls to other services on shutdown"""
+    try:
+        yield
+    finally:
+        await close_service_client()
+
+
+# In-flight data node GETs, keyed by path
+_data_node_reads = SingleFlight()
+
+
+async def get_from_data_node(path: str) -> Dict[str, Any]:
+    """GET a data node path. Concurrent requests for the same path (a student
+    opening several pages at once, many students loading the same course)
+    share one call; the result must not be modified.
+    """
+    return await _data_node_reads.do(
+        path, call_service_api, f"{DATA_NODE_URL}{path}", "GET", {"Internal-Token": INTERNAL_TOKEN}
+    )
+
+
+async def get_courses(course_ids: List[int]) -> List[Dict[str, Any]]:
+    """Fetch course details from the data node concurrently, in the given order.
+    
+    Courses that cannot be fetched are left out.
+    """
+    results = await asyncio.gather(
+        *(get_from_data_node(f"/get/course?course_id={course_id}") for course_id in course_ids),
+        return_exceptions=True,
+    )
+    return [course for course in results if not isinstance(course, BaseException)]
+
+
 # FastAPI app
-app = FastAPI(title="Student Service Node", version="1.0.0")
+app = FastAPI(title="Student Service Node", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -74,44 +119,21 @@ async def get_available_courses(
     """Get list of available courses"""
     student_id = current_user.get("user_id")
     
-    # Get student data to check tags
-    student_url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student_result = await call_service_api(
-        student_url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
-    student_tags = set(student_result.get("student_tags", []))
-    
-    # Get all courses from data node
-    url = f"{DATA_NODE_URL}/get/courses"
+    # The data node filters by the student's tags (student must have ALL
+    # course tags) and paginates, so only the requested page comes back
+    params = {"student_id": student_id, "page": page, "page_size": page_size}
     if course_type:
-        url += f"?course_type={course_type}"
+        params["course_type"] = course_type
     
     result = await call_service_api(
-        url,
+        f"{DATA_NODE_URL}/get/courses?{urlencode(params)}",
         method="GET",
         headers={"Internal-Token": INTERNAL_TOKEN}
     )
     
-    courses = result.get("courses", [])
-    
-    # Filter courses: student must have ALL course tags
-    filtered_courses = []
-    for course in courses:
-        course_tags = set(course.get("course_tags", []))
-        # If course has no tags or student has all required tags, include the course
-        if not course_tags or course_tags.issubset(student_tags):
-            filtered_courses.append(course)
-    
-    # Implement pagination
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_courses = filtered_courses[start:end]
-    
     return {
-        "courses": paginated_courses,
-        "total": len(filtered_courses),
+        "courses": result.get("courses", []),
+        "total": result.get("total", 0),
         "page": page,
         "page_size": page_size
     }
@@ -125,12 +147,7 @@ async def get_selected_courses(
     student_id = current_user.get("user_id")
     
     # Get student info from data node
-    url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    student = await get_from_data_node(f"/get/student?student_id={student_id}")
     
     student_courses = student.get("student_courses", [])
     
@@ -138,14 +155,8 @@ async def get_selected_courses(
     courses = []
     total_credit = 0
     
-    for course_id in student_courses:
+    for course in await get_courses(student_courses):
         try:
-            url = f"{DATA_NODE_URL}/get/course?course_id={course_id}"
-            course = await call_service_api(
-                url,
-                method="GET",
-                headers={"Internal-Token": INTERNAL_TOKEN}
-            )
             courses.append(course)
             total_credit += course.get("course_credit", 0)
         except:
@@ -167,13 +178,8 @@ async def select_course(
     student_id = current_user.get("user_id")
     
     # Check if course exists and has space
-    url = f"{DATA_NODE_URL}/get/course?course_id={selection.course_id}"
     try:
-        course = await call_service_api(
-            url,
-            method="GET",
-            headers={"Internal-Token": INTERNAL_TOKEN}
-        )
+        course = await get_from_data_node(f"/get/course?course_id={selection.course_id}")
     except:
         raise HTTPException(status_code=404, detail="Course not found")
     
@@ -262,20 +268,10 @@ async def get_course_detail(
         raise HTTPException(status_code=400, detail="course_id is required")
     
     # Get course info
-    url = f"{DATA_NODE_URL}/get/course?course_id={course_id}"
-    course = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    course = await get_from_data_node(f"/get/course?course_id={course_id}")
     
     # Get student info to check if already selected
-    url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    student = await get_from_data_node(f"/get/student?student_id={student_id}")
     
     is_selected = course_id in student.get("student_courses", [])
     
@@ -293,12 +289,7 @@ async def get_student_schedule(
     student_id = current_user.get("user_id")
     
     # Get student's selected courses
-    url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    student = await get_from_data_node(f"/get/student?student_id={student_id}")
     
     student_courses = student.get("student_courses", [])
     
@@ -308,27 +299,16 @@ async def get_student_schedule(
     for i in range(1, 8):
         schedule[i] = []
     
-    for course_id in student_courses:
+    for course in await get_courses(student_courses):
         try:
-            url = f"{DATA_NODE_URL}/get/course?course_id={course_id}"
-            course = await call_service_api(
-                url,
-                method="GET",
-                headers={"Internal-Token": INTERNAL_TOKEN}
-            )
-            
             # Get course weekdays - courses can span multiple days
             course_weekdays = course.get("course_weekdays", [])
             
             # If no weekdays specified, try to parse from course_schedule
             if not course_weekdays and course.get("course_schedule"):
                 # course_schedule format: {"monday": [1,2], "wednesday": [3,4], ...}
-                day_map = {
-                    "monday": 1, "tuesday": 2, "wednesday": 3, "thursday": 4,
-                    "friday": 5, "saturday": 6, "sunday": 7
-                }
                 course_schedule = course.get("course_schedule", {})
-                course_weekdays = [day_map[day] for day in course_schedule.keys() if day in day_map]
+                course_weekdays = [WEEKDAY_NUMBERS[day] for day in course_schedule.keys() if day in WEEKDAY_NUMBERS]
             
             # If still no weekdays, use legacy field or default to day 1 (Monday)
             if not course_weekdays:
@@ -364,12 +344,7 @@ async def get_student_stats(
     student_id = current_user.get("user_id")
     
     # Get student's selected courses
-    url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    student = await get_from_data_node(f"/get/student?student_id={student_id}")
     
     student_courses = student.get("student_courses", [])
     
@@ -378,15 +353,8 @@ async def get_student_stats(
     courses_by_type = {}
     credit_by_type = {}
     
-    for course_id in student_courses:
+    for course in await get_courses(student_courses):
         try:
-            url = f"{DATA_NODE_URL}/get/course?course_id={course_id}"
-            course = await call_service_api(
-                url,
-                method="GET",
-                headers={"Internal-Token": INTERNAL_TOKEN}
-            )
-            
             credit = course.get("course_credit", 0)
             course_type = course.get("course_type", "Unknown")
             
@@ -440,12 +408,7 @@ async def check_course_conflicts(
     
     # Get course info
     try:
-        url = f"{DATA_NODE_URL}/get/course?course_id={course_id}"
-        course = await call_service_api(
-            url,
-            method="GET",
-            headers={"Internal-Token": INTERNAL_TOKEN}
-        )
+        course = await get_from_data_node(f"/get/course?course_id={course_id}")
     except:
         return {
             "can_select": False,
@@ -461,12 +424,7 @@ async def check_course_conflicts(
         })
     
     # Get student's current courses
-    url = f"{DATA_NODE_URL}/get/student?student_id={student_id}"
-    student = await call_service_api(
-        url,
-        method="GET",
-        headers={"Internal-Token": INTERNAL_TOKEN}
-    )
+    student = await get_from_data_node(f"/get/student?student_id={student_id}")
     
     # Check if already selected
     if course_id in student.get("student_courses", []):
@@ -478,15 +436,8 @@ async def check_course_conflicts(
     
     # Check for time conflicts
     # This is a simplified version - in production you'd have more sophisticated conflict detection
-    for existing_course_id in student.get("student_courses", []):
+    for existing_course in await get_courses(student.get("student_courses", [])):
         try:
-            url = f"{DATA_NODE_URL}/get/course?course_id={existing_course_id}"
-            existing_course = await call_service_api(
-                url,
-                method="GET",
-                headers={"Internal-Token": INTERNAL_TOKEN}
-            )
-            
             # Simple time conflict check
             if (course.get("course_time_begin") <= existing_course.get("course_time_end") and
                 course.get("course_time_end") >= existing_course.get("course_time_begin")):
@@ -494,7 +445,7 @@ async def check_course_conflicts(
                 conflicts.append({
                     "type": "time_conflict",
                     "message": f"Time conflict with {existing_course.get('course_name')}",
-                    "course_id": existing_course_id,
+                    "course_id": existing_course.get("course_id"),
                     "course_name": existing_course.get("course_name")
                 })
         except:
@@ -1,9 +1,9 @@
 """Teacher Service Node - Teacher course management"""
-from fastapi import FastAPI, HTTPException, Depends, Header, status, Request
+from fastapi import FastAPI, HTTPException, Depends, Header, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
 import os
-import httpx
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -14,7 +14,7 @@ load_dotenv(dotenv_path=Path(__file__).with_name('.env'), override=True)
 from backend.common import (
     CourseCreate, CourseUpdate,
     get_current_user_from_token, verify_user_type,
-    call_service_api, get_request_headers, api_limiter,
+    call_service_api, get_service_client, close_service_client, get_request_headers, api_limiter,
     create_socket_server_config, SocketClient,
 )
 
@@ -24,8 +24,18 @@ DATA_NODE_URL = os.getenv("DATA_NODE_URL", "http://localhost:8001")
 INTERNAL_TOKEN = os.getenv("INTERNAL_TOKEN", "change-this-internal-token")
 PORT = int(os.getenv("PORT", "8003"))
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the pooled client used for calls to other services on shutdown"""
+    try:
+        yield
+    finally:
+        await close_service_client()
+
+
 # FastAPI app
-app = FastAPI(title="Teacher Service Node", version="1.0.0")
+app = FastAPI(title="Teacher Service Node", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -305,15 +315,14 @@ async def get_all_students(
     """Get list of all students (for adding to courses)"""
     # Get all users from auth node
     url = f"{AUTH_NODE_URL}/admin/users?user_type=student&page=1&page_size=1000"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url,
-            headers={"Internal-Token": INTERNAL_TOKEN}
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch students: {response.text}")
-        
-        return response.json()
+    response = await get_service_client().get(
+        url,
+        headers={"Internal-Token": INTERNAL_TOKEN}
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch students: {response.text}")
+    
+    return Response(content=response.content, media_type="application/json")
 
 
 @app.post("/teacher/course/add-students")
@@ -397,29 +406,28 @@ async def bulk_add_students_to_course(
     
     for username in usernames:
         try:
-            # Get user by username from auth node
-            url = f"{AUTH_NODE_URL}/admin/user?username={username}"
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    url,
-                    headers={"Internal-Token": INTERNAL_TOKEN}
-                )
-                if response.status_code != 200:
-                    errors.append(f"{username}: User not found")
-                    continue
-                
-                user_data = response.json()
-                student_id = user_data.get("user_id")
-                
-                # Add student to course
-                url = f"{DATA_NODE_URL}/select/course"
-                await call_service_api(
-                    url,
-                    method="POST",
-                    headers={"Internal-Token": INTERNAL_TOKEN},
-                    json_data={"student_id": student_id, "course_id": course_id}
-                )
-                success_count += 1
+            # Get the student with this username from auth node
+            response = await get_service_client().get(
+                f"{AUTH_NODE_URL}/admin/user",
+                params={"username": username, "user_type": "student"},
+                headers={"Internal-Token": INTERNAL_TOKEN}
+            )
+            if response.status_code != 200:
+                errors.append(f"{username}: User not found")
+                continue
+            
+            user_data = response.json()
+            student_id = user_data.get("user_id")
+            
+            # Add student to course
+            url = f"{DATA_NODE_URL}/select/course"
+            await call_service_api(
+                url,
+                method="POST",
+                headers={"Internal-Token": INTERNAL_TOKEN},
+                json_data={"student_id": student_id, "course_id": course_id}
+            )
+            success_count += 1
         except Exception as e:
             errors.append(f"{username}: {str(e)}")
     
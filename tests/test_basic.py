@@ -4,9 +4,15 @@ from backend.common import (
     verify_password,
     get_password_hash,
     generate_totp_secret,
+    verify_totp,
     TokenBucket,
     RateLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    TTLCache,
+    SingleFlight,
 )
+import orjson
 
 
 def test_password_hashing():
@@ -28,6 +34,23 @@ def test_totp_generation():
     assert secret.isalnum()
 
 
+def test_totp_verification():
+    """Test TOTP verification matches pyotp within the +/-1 window"""
+    import time
+    import pyotp
+
+    secret = generate_totp_secret()
+    totp = pyotp.TOTP(secret)
+    now = time.time()
+
+    assert verify_totp(secret, totp.at(now))
+    assert verify_totp(secret, totp.at(now - 30))
+    assert verify_totp(secret, totp.at(now + 30))
+    assert not verify_totp(secret, totp.at(now - 120))
+    assert not verify_totp(None, totp.at(now))
+    assert not verify_totp(secret, "")
+
+
 def test_token_bucket():
     """Test token bucket rate limiting"""
     bucket = TokenBucket(capacity=10, refill_rate=1.0)
@@ -64,5 +87,502 @@ def test_rate_limiter():
     assert limiter.check_rate_limit("user2", tokens=1) == True
 
 
+def test_circuit_breaker():
+    """Test circuit breaker opens after consecutive failures"""
+    import asyncio
+
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=60.0)
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def succeed():
+        return "ok"
+
+    assert asyncio.run(breaker.call(succeed)) == "ok"
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            asyncio.run(breaker.call(fail))
+
+    # Circuit is open now and rejects calls without running them
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(succeed))
+
+
+def test_circuit_breaker_half_open():
+    """Test that after reset_timeout one trial call runs, and its outcome decides"""
+    import asyncio
+    import time
+
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0.05)
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def slow_succeed():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(breaker.call(fail))
+    time.sleep(0.06)
+
+    # A failed trial re-opens the circuit
+    with pytest.raises(RuntimeError):
+        asyncio.run(breaker.call(fail))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(breaker.call(slow_succeed))
+    time.sleep(0.06)
+
+    async def burst():
+        return await asyncio.gather(
+            *(breaker.call(slow_succeed) for _ in range(3)), return_exceptions=True
+        )
+
+    # Only the trial call gets through while half-open
+    results = asyncio.run(burst())
+    assert results[0] == "ok"
+    assert all(isinstance(result, CircuitOpenError) for result in results[1:])
+
+    # The trial succeeded, so the circuit is closed again
+    assert asyncio.run(breaker.call(slow_succeed)) == "ok"
+
+
+def test_retry_async_only_retries_unsent_requests():
+    """Test that retry_async retries connect errors but not errors after sending"""
+    import asyncio
+    import httpx
+    from backend.common import retry_async
+
+    def flaky(error):
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise error("boom")
+            return "ok"
+        return call, attempts
+
+    call, attempts = flaky(httpx.ConnectError)
+    assert asyncio.run(retry_async(call, initial_wait=0)) == "ok"
+    assert len(attempts) == 2
+
+    # The request may have been applied, so it is not sent again
+    call, attempts = flaky(httpx.ReadTimeout)
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(retry_async(call, initial_wait=0))
+    assert len(attempts) == 1
+
+
+def test_ttl_cache():
+    """Test TTL cache expiry and size bound"""
+    cache = TTLCache(maxsize=2, ttl=60.0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    # Oldest entry evicted once maxsize is exceeded
+    assert "a" not in cache
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+
+    expired = TTLCache(maxsize=2, ttl=0.0)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+
+def test_single_flight():
+    """Test that concurrent calls with the same key share one execution"""
+    import asyncio
+
+    calls = []
+
+    async def lookup(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key * 2
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            flight.do("a", lookup, "a"),
+            flight.do("a", lookup, "a"),
+            flight.do("b", lookup, "b"),
+        )
+        assert len(flight) == 0
+        return results
+
+    assert asyncio.run(run()) == ["aa", "aa", "bb"]
+    assert calls == ["a", "b"]
+
+
+def test_single_flight_leader_cancelled():
+    """Test that cancelling the caller running a shared call does not fail the others"""
+    import asyncio
+
+    calls = []
+
+    async def lookup(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key * 2
+
+    async def run():
+        flight = SingleFlight()
+        leader = asyncio.create_task(flight.do("a", lookup, "a"))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("a", lookup, "a")) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert len(flight) == 0
+        return results
+
+    # The followers retried, sharing a single second call
+    assert asyncio.run(run()) == ["aa", "aa"]
+    assert calls == ["a", "a"]
+
+
+def test_fetch_student_tags_chunks():
+    """Test student tag lookups stay under the data node's per-request limit"""
+    import asyncio
+    import httpx
+    from backend.auth_node.routers.user_management_routes import _fetch_student_tags
+    from backend.data_node.routers.student_routes import MAX_BATCH_STUDENT_IDS
+
+    requests = []
+
+    def data_node(request):
+        ids = [int(i) for i in request.url.params.get_list("student_ids")]
+        requests.append(ids)
+        if len(ids) > MAX_BATCH_STUDENT_IDS:
+            return httpx.Response(400, json={"detail": "too many"})
+        return httpx.Response(200, json=[{"student_id": i, "student_tags": [f"t{i}"]} for i in ids])
+
+    async def fetch(student_ids, handler):
+        async with httpx.AsyncClient(base_url="http://data", transport=httpx.MockTransport(handler)) as client:
+            return await _fetch_student_tags(client, student_ids)
+
+    tags = asyncio.run(fetch(range(2500), data_node))
+    assert len(tags) == 2500
+    assert tags[2499] == ["t2499"]
+    assert max(len(ids) for ids in requests) <= MAX_BATCH_STUDENT_IDS
+
+    assert asyncio.run(fetch([], data_node)) == {}
+
+    # A failed lookup is an error, never "no tags"
+    with pytest.raises(httpx.HTTPError):
+        asyncio.run(fetch([1, 2], lambda request: httpx.Response(500)))
+
+
+def _memory_session_factory(base):
+    """Session factory for a fresh in-memory SQLite database with base's tables"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _router_client(*routers):
+    """TestClient for an app serving the given routers"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router)
+    return TestClient(app)
+
+
+def _get_db_from(session_factory):
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    return get_db
+
+
+def test_data_node_outbox_delivery():
+    """Test outbox ops are delivered and deleted, retried after 5xx, failed after 4xx"""
+    import asyncio
+    from datetime import datetime, timedelta, timezone
+    import httpx
+    from backend.common import AuthBase, PendingDataNodeOp
+    from backend.auth_node.data_node_outbox import DataNodeOutbox, OUTBOX_RETRY_BASE_SECONDS
+
+    session_factory = _memory_session_factory(AuthBase)
+    sent = []
+    data_node_up = False
+
+    def data_node(request):
+        sent.append(request.url.path)
+        if request.url.path == "/bad":
+            return httpx.Response(400, text="rejected")
+        if request.url.path == "/flaky" and not data_node_up:
+            return httpx.Response(503, text="unavailable")
+        return httpx.Response(201, json={})
+
+    async def deliver():
+        async with httpx.AsyncClient(base_url="http://data", transport=httpx.MockTransport(data_node)) as client:
+            return await DataNodeOutbox(session_factory, client).deliver_due()
+
+    with session_factory() as db:
+        for path in ("/ok", "/flaky", "/bad"):
+            DataNodeOutbox.add(db, path, {"path": path})
+        db.commit()
+
+    wait = asyncio.run(deliver())
+    assert sent == ["/ok", "/flaky", "/bad"]
+    assert 0 < wait <= OUTBOX_RETRY_BASE_SECONDS
+    with session_factory() as db:
+        ops = {op.path: op for op in db.query(PendingDataNodeOp)}
+        assert set(ops) == {"/flaky", "/bad"}  # delivered op deleted
+        assert (ops["/bad"].status, ops["/bad"].attempts, ops["/bad"].last_error) == ("failed", 1, "rejected")
+        assert (ops["/flaky"].status, ops["/flaky"].attempts) == ("pending", 1)
+
+    # The retry is backed off: nothing is due yet
+    sent.clear()
+    asyncio.run(deliver())
+    assert sent == []
+
+    # Once due and the data node is back, the op is delivered; failed ops are not resent
+    data_node_up = True
+    with session_factory() as db:
+        op = db.query(PendingDataNodeOp).filter(PendingDataNodeOp.path == "/flaky").one()
+        op.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()
+    asyncio.run(deliver())
+    assert sent == ["/flaky"]
+    with session_factory() as db:
+        assert [op.path for op in db.query(PendingDataNodeOp)] == ["/bad"]
+
+
+def test_add_user_queues_data_node_record():
+    """Test that adding a student answers 201 and queues its data node record"""
+    import asyncio
+    import httpx
+    from backend.common import AuthBase, PendingDataNodeOp, Student
+    from backend.auth_node.data_node_outbox import DataNodeOutbox
+    from backend.auth_node.routers.user_management_routes import create_user_management_router
+
+    session_factory = _memory_session_factory(AuthBase)
+    outbox = DataNodeOutbox(session_factory, None)
+    client = _router_client(create_user_management_router(
+        _get_db_from(session_factory),
+        verify_admin_or_internal=lambda: None,
+        get_current_admin=lambda: None,
+        get_http_client=lambda: None,
+        get_data_node_outbox=lambda: outbox,
+    ))
+
+    response = client.post("/admin/user/add", json={"username": "alice", "password": "pw", "user_type": "student"})
+    assert response.status_code == 201
+    assert client.post(
+        "/admin/user/add", json={"username": "alice", "password": "pw", "user_type": "student"}
+    ).status_code == 400
+
+    with session_factory() as db:
+        student_id = db.query(Student.student_id).filter(Student.username == "alice").scalar()
+        [op] = db.query(PendingDataNodeOp).all()
+        assert op.path == "/add/student"
+        assert op.payload == {"student_id": student_id, "student_name": "alice", "student_tags": []}
+
+    posted = []
+
+    def data_node(request):
+        posted.append((request.url.path, orjson.loads(request.content)))
+        return httpx.Response(201, json={})
+
+    async def deliver():
+        async with httpx.AsyncClient(base_url="http://data", transport=httpx.MockTransport(data_node)) as http:
+            outbox.client = http
+            await outbox.deliver_due()
+
+    asyncio.run(deliver())
+    assert posted == [("/add/student", {"student_id": student_id, "student_name": "alice", "student_tags": []})]
+    with session_factory() as db:
+        assert db.query(PendingDataNodeOp).count() == 0
+
+
+def test_register_queues_data_node_record():
+    """Test that registration commits the user and its queued data node record together"""
+    from datetime import datetime, timedelta, timezone
+    from backend.common import AuthBase, PendingDataNodeOp, RegistrationCode, Student
+    from backend.auth_node.data_node_outbox import DataNodeOutbox
+    from backend.auth_node.routers.auth_routes import create_auth_router
+
+    session_factory = _memory_session_factory(AuthBase)
+    outbox = DataNodeOutbox(session_factory, None)
+    client = _router_client(create_auth_router(_get_db_from(session_factory), lambda: outbox))
+    with session_factory() as db:
+        db.add(RegistrationCode(
+            code="CODE", user_type="student", created_by=1, code_tags=["cs"],
+            expires_at=datetime.now(timezone.utc) + timedelta(days=1),
+        ))
+        db.commit()
+
+    user = {"username": "bob", "password": "password123", "user_type": "student", "registration_code": "CODE"}
+    response = client.post("/register/v1", json=user)
+    assert response.status_code == 200
+    assert response.json()["refresh_token"]
+
+    with session_factory() as db:
+        student_id = db.query(Student.student_id).filter(Student.username == "bob").scalar()
+        [op] = db.query(PendingDataNodeOp).all()
+        assert op.path == "/add/student"
+        assert op.payload == {"student_id": student_id, "student_name": "bob", "student_tags": ["cs"]}
+        assert db.query(RegistrationCode.is_used).scalar()
+
+    # The code is used up, so nothing more is written
+    assert client.post("/register/v1", json=user).status_code == 400
+    with session_factory() as db:
+        assert db.query(PendingDataNodeOp).count() == 1
+
+
+def test_check_2fa_status_follows_the_database():
+    """Test /check/2fa-status reflects 2FA toggled after the refresh token was issued"""
+    from backend.common import AuthBase, Student, create_refresh_token
+    from backend.auth_node.routers.auth_routes import create_auth_router
+
+    session_factory = _memory_session_factory(AuthBase)
+    client = _router_client(create_auth_router(_get_db_from(session_factory), lambda: None))
+    with session_factory() as db:
+        student = Student(username="carol", password_hash="x", has_2fa=False, is_active=True)
+        db.add(student)
+        db.commit()
+        student_id = student.student_id
+
+    token = create_refresh_token(
+        {"user_id": student_id, "username": "carol", "user_type": "student", "has_2fa": False}
+    )
+
+    def status():
+        response = client.get("/check/2fa-status", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        return response.json()
+
+    assert status() == {"has_2fa": False, "user_type": "student", "username": "carol"}
+    with session_factory() as db:
+        db.query(Student).update({"has_2fa": True})
+        db.commit()
+    assert status()["has_2fa"] is True
+
+
+def test_add_student_is_idempotent():
+    """Test that repeating a create with the same ID and name returns the stored record"""
+    from backend.common import DataBase
+    from backend.data_node.routers.student_routes import create_student_router
+
+    session_factory = _memory_session_factory(DataBase)
+    client = _router_client(create_student_router(_get_db_from(session_factory), lambda: None))
+    student = {"student_id": 7, "student_name": "s", "student_tags": ["cs"]}
+
+    first = client.post("/add/student", json=student)
+    again = client.post("/add/student", json=student)
+    assert first.status_code == again.status_code == 201
+    assert again.json() == first.json()
+    assert client.post("/add/student", json={**student, "student_name": "other"}).status_code == 400
+    assert client.post("/add/student", json={**student, "student_id": 8}).status_code == 400
+
+
+def test_bulk_rename():
+    """Test bulk renames report unknown and clashing names per entry"""
+    from sqlalchemy import select
+    from backend.common import DataBase, StudentCourseData, TeacherCourseData
+    from backend.data_node.routers.student_routes import create_student_router
+    from backend.data_node.routers.teacher_routes import create_teacher_router
+
+    session_factory = _memory_session_factory(DataBase)
+    get_db = _get_db_from(session_factory)
+    client = _router_client(
+        create_student_router(get_db, lambda: None), create_teacher_router(get_db, lambda: None)
+    )
+    for name in ("a", "b", "taken"):
+        client.post("/add/student", json={"student_name": name, "student_tags": []})
+        client.post("/add/teacher", json={"teacher_name": name})
+
+    for kind, name_column in (
+        ("student", StudentCourseData.student_name),
+        ("teacher", TeacherCourseData.teacher_name),
+    ):
+        response = client.post(
+            f"/bulk/rename/{kind}s", json={"a": "Alice", "b": "taken", "missing": "x", "taken": "taken"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "success": True,
+            "renamed_count": 1,
+            "errors": {
+                "b": f"{kind.capitalize()} with this name already exists",
+                "missing": f"{kind.capitalize()} not found",
+            },
+        }
+        with session_factory() as db:
+            assert sorted(db.execute(select(name_column)).scalars()) == ["Alice", "b", "taken"]
+
+    too_many = {str(i): f"n{i}" for i in range(1001)}
+    assert client.post("/bulk/rename/students", json=too_many).status_code == 400
+
+
+def test_get_courses_for_student():
+    """Test /get/courses?student_id= lists only courses the student's tags allow"""
+    from backend.common import DataBase, Course
+    from backend.data_node.routers.course_routes import create_course_router
+    from backend.data_node.routers.student_routes import create_student_router
+
+    session_factory = _memory_session_factory(DataBase)
+    get_db = _get_db_from(session_factory)
+    client = _router_client(
+        create_course_router(get_db, lambda: None), create_student_router(get_db, lambda: None)
+    )
+    with session_factory() as db:
+        for name, tags in (("open", []), ("cs", ["cs"]), ("cs-honors", ["cs", "honors"]), ("art", ["art"]),
+                           ("untagged", None), ("cs2", ["cs"])):
+            db.add(Course(course_name=name, course_credit=1, course_type="required", course_teacher_id=1,
+                          course_location="room", course_capacity=10, course_tags=tags))
+        db.commit()
+    student_id = client.post("/add/student", json={"student_name": "s", "student_tags": ["cs"]}).json()["student_id"]
+
+    def names(**params):
+        response = client.get("/get/courses", params={"student_id": student_id, **params})
+        assert response.status_code == 200
+        data = response.json()
+        return [course["course_name"] for course in data["courses"]], data["total"]
+
+    assert names() == (["open", "cs", "untagged", "cs2"], 4)
+    assert names(page=2, page_size=3) == (["cs2"], 4)
+    assert client.get("/get/courses", params={"student_id": student_id + 1}).status_code == 404
+    assert client.get("/get/courses").json()["total"] == 6
+
+
+def test_get_client_ip_matches_rate_limiter():
+    """Registration and the rate limiters resolve the client IP the same way"""
+    from starlette.requests import Request
+    from backend.common import IPRateLimiter, get_client_ip, get_request_headers
+
+    def request(headers, client=("10.0.0.9", 1234)):
+        raw = [(k.encode(), v.encode()) for k, v in headers.items()]
+        return Request({"type": "http", "headers": raw, "client": client})
+
+    limiter = IPRateLimiter()
+    for headers, client, expected in (
+        ({"x-forwarded-for": "1.2.3.4, 10.0.0.1"}, ("10.0.0.9", 1234), "1.2.3.4"),
+        ({"x-real-ip": "5.6.7.8"}, ("10.0.0.9", 1234), "5.6.7.8"),
+        ({}, ("10.0.0.9", 1234), "10.0.0.9"),
+        ({}, None, "unknown"),
+    ):
+        req = request(headers, client)
+        assert get_client_ip(req) == expected
+        assert limiter.get_client_ip(get_request_headers(req)) == expected
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])